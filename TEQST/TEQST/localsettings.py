@@ -0,0 +1,38 @@
+import os, uuid
+from .settings import *
+
+"""
+This template embodies the standard Django settings setup.
+
+Copy this file into the TEQST directory (next to settings.py)
+and rename it to 'localsettings.py'. This file is then gitignored
+and you can manage local settings in this file.
+
+You can use the "python manage.py newsecretkey" command to generate
+a new random secret key to use for the SECRET_KEY setting.
+"""
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = 'test-secret'
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = True
+
+# Database
+# https://docs.djangoproject.com/en/3.0/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+    }
+}
+
+# Specify the amount of proxy levels the server is running behind, to more accurately use throttling
+REST_FRAMEWORK['NUM_PROXIES'] = None
+
+# Specify folder root_ids visible to all users
+DEFAULT_FOLDER = [
+    #uuid.UUID('<str>'),
+]
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {'anon': '100000/day', 'user': '100000/day'}
@@ -146,6 +146,31 @@ REST_FRAMEWORK = {
 
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
+# Runner for background jobs like the analysis of uploaded recordings, see recordingmgmt/jobs.py
+# Use 'recordingmgmt.jobs.DatabaseRunner' together with "python manage.py runjobs" to process jobs in a separate worker
+JOB_RUNNER = 'recordingmgmt.jobs.ThreadRunner'
+# Number of threads of the ThreadRunner. Assemblies of the same TextRecording are serialized with a row lock,
+# except on SQLite, which doesn't support it and needs a single worker.
+JOB_WORKERS = 1
+
+# Number of sentences inserted per query when a text is uploaded
+SENTENCE_BATCH_SIZE = 1000
+# Number of worker processes which parse the files of a multi-file text upload, 0 or 1 parses them in the request
+TEXT_UPLOAD_WORKERS = 0
+# Load the nltk sentence tokenizers of all Languages on startup instead of on the first upload with tokenize set
+PRELOAD_SENTENCE_TOKENIZERS = False
+
+# Generate the speech data download on the fly instead of storing download.zip first
+STREAM_DOWNLOADS = True
+
+# Seconds the publisher and listener stats are cached in the default cache (see CACHES, local memory if it isn't set).
+# Cached stats are invalidated whenever the shared folder changes, see textmgmt/signals.py. The versions they are stored
+# under are kept in the database, so the cache doesn't have to be shared between the processes for that.
+STATS_CACHE_TIMEOUT = 60 * 60
+# Seconds the speakers visible to a listener are cached. They are stored under the versions of the listener permissions,
+# which are read from the database every time, so changed permissions apply at once in every process
+LISTENER_VISIBILITY_CACHE_TIMEOUT = 60 * 60
+
 
 #Leave this as far down in this file as possible. Only settings that rely on definitions in the localsettings file should go below this import
 from .localsettings import *
@@ -0,0 +1,192 @@
+"""
+Incremental assembly of the concatenated audiofile of a TextRecording.
+
+Every SentenceRecording keeps the position of its frames inside the assembled wav file
+(frame_offset and frame_count). When a single SentenceRecording is added or re-recorded,
+only its own byte range is rewritten (plus the tail of the file if the length changed),
+instead of re-reading every SentenceRecording from storage.
+"""
+from django.core.files.storage import default_storage
+from django.db import models
+import contextlib, io, struct, wave
+
+
+def supports_inplace_writes(name):
+    """
+    Storages which map to the local filesystem can be opened in 'r+b' mode.
+    Remote storages (e.g. GoogleCloudStorage) don't implement path().
+    """
+    try:
+        default_storage.path(name)
+    except NotImplementedError:
+        return False
+    return True
+
+
+@contextlib.contextmanager
+def open_for_update(name):
+    """
+    Yields a seekable, writable file object for the stored file.
+    On remote storages the file is read once, modified in memory and written back.
+    """
+    if supports_inplace_writes(name):
+        with default_storage.open(name, 'r+b') as f:
+            yield f
+        return
+    with default_storage.open(name, 'rb') as f:
+        buffer = io.BytesIO(f.read())
+    yield buffer
+    # accessing files from their FileFields in write mode under the use of the GoogleCloudStorage from django-storages
+    # causes errors. Opening files in write mode from the storage works.
+    with default_storage.open(name, 'wb') as f:
+        f.write(buffer.getvalue())
+
+
+def data_chunk(file):
+    """
+    Returns (offset, size) of the payload of the data chunk of a wav file, or None if there is no valid data chunk
+    """
+    file.seek(0)
+    riff = file.read(12)
+    if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:] != b'WAVE':
+        return None
+    while True:
+        header = file.read(8)
+        if len(header) < 8:
+            return None
+        chunk_id, size = struct.unpack('<4sI', header)
+        if chunk_id == b'data':
+            return file.tell(), size
+        # chunks are word aligned
+        file.seek(size + (size & 1), 1)
+
+
+def same_format(p1, p2):
+    return (p1.nchannels, p1.sampwidth, p1.framerate, p1.comptype) == \
+           (p2.nchannels, p2.sampwidth, p2.framerate, p2.comptype)
+
+
+def read_frames(wav):
+    """
+    Reads all frames of an open wave.Wave_read. Returns (frames, nframes).
+    The header may announce more frames than the file actually contains, so nframes is computed from the data.
+    """
+    frames = wav.readframes(wav.getnframes())
+    return frames, len(frames) // (wav.getnchannels() * wav.getsampwidth())
+
+
+def rebuild(trec, changed=None):
+    """
+    Concatenates all SentenceRecordings of trec and rebuilds the frame index from scratch.
+    If given, the in-memory instance `changed` is kept in sync with the new index.
+    Returns the wav params of the assembled file.
+    """
+    srecs = list(trec.srecs.all())
+    params = None
+    offset = 0
+    # accessing files from their FileFields in write mode under the use of the GoogleCloudStorage from django-storages
+    # causes errors. Opening files in write mode from the storage works.
+    with default_storage.open(trec.audiofile.name, 'wb') as audio_full:
+        # since the wave library internally uses python's standard open() method to open files
+        # it needs to be handed an already opened file when working with Google Cloud storage
+        wav_full = wave.open(audio_full, 'wb')
+        for srec in srecs:
+            with srec.audiofile.open('rb') as srec_audio:
+                wav_part = wave.open(srec_audio, 'rb')
+                #On concatenating the first file: also copy all settings
+                if params is None:
+                    params = wav_part.getparams()
+                    wav_full.setparams(params)
+                frames, nframes = read_frames(wav_part)
+                wav_full.writeframesraw(frames)
+                wav_part.close()
+            srec.frame_offset = offset
+            srec.frame_count = nframes
+            if changed is not None and srec.pk == changed.pk:
+                changed.frame_offset = offset
+                changed.frame_count = nframes
+            offset += nframes
+        wav_full.close()
+    trec.srecs.bulk_update(srecs, ['frame_offset', 'frame_count'])
+    return params
+
+
+def splice(full, offset, count, indexed_frames, part_params, frames):
+    """
+    Replaces `count` frames starting at frame `offset` of the open wav file `full` with `frames`.
+    Returns the wav params of `full`, or None (without modifying it) if `full` does not match the frame index.
+    """
+    chunk = data_chunk(full)
+    if chunk is None:
+        return None
+    data_start, data_size = chunk
+    full.seek(0)
+    wav_full = wave.open(full, 'rb')
+    params = wav_full.getparams()
+    wav_full.close()
+    frame_size = params.nchannels * params.sampwidth
+    if not same_format(params, part_params) or data_size != indexed_frames * frame_size:
+        return None
+
+    begin = data_start + offset * frame_size
+    end = begin + count * frame_size
+    if len(frames) == end - begin:
+        full.seek(begin)
+        full.write(frames)
+        return params
+    full.seek(end)
+    tail = full.read()
+    full.seek(begin)
+    full.write(frames)
+    full.write(tail)
+    full.truncate()
+    size = full.tell()
+    # Patch RIFF and data chunk sizes
+    full.seek(4)
+    full.write(struct.pack('<I', size - 8))
+    full.seek(data_start - 4)
+    full.write(struct.pack('<I', data_size - (end - begin) + len(frames)))
+    return params
+
+
+def update(trec, changed):
+    """
+    Splices the audio of a single new or re-recorded SentenceRecording into the assembled audiofile of trec.
+    New recordings can only be appended after the last indexed one.
+    Falls back to rebuild() whenever the frame index does not match the assembled file.
+    Returns the wav params of the assembled file.
+    """
+    srecs = list(trec.srecs.all())
+    others = [srec for srec in srecs if srec.pk != changed.pk]
+    if any(srec.frame_offset is None for srec in others):
+        return rebuild(trec, changed)
+    indexed_frames = sum(srec.frame_count for srec in others)
+
+    old_offset, old_count = changed.frame_offset, changed.frame_count
+    if old_offset is None:
+        # Unindexed recordings can only be appended
+        if srecs[-1].pk != changed.pk:
+            return rebuild(trec, changed)
+        old_offset, old_count = indexed_frames, 0
+    else:
+        indexed_frames += old_count
+
+    with changed.audiofile.open('rb') as srec_audio:
+        wav_part = wave.open(srec_audio, 'rb')
+        part_params = wav_part.getparams()
+        frames, nframes = read_frames(wav_part)
+        wav_part.close()
+
+    with open_for_update(trec.audiofile.name) as full:
+        params = splice(full, old_offset, old_count, indexed_frames, part_params, frames)
+    if params is None:
+        return rebuild(trec, changed)
+
+    delta = nframes - old_count
+    if delta != 0:
+        # Ordering of srecs is by sentence, so all following recordings are shifted
+        trec.srecs.filter(sentence__gt=changed.sentence_id).update(frame_offset=models.F('frame_offset') + delta)
+    trec.srecs.filter(pk=changed.pk).update(frame_offset=old_offset, frame_count=nframes)
+    changed.frame_offset = old_offset
+    changed.frame_count = nframes
+    return params
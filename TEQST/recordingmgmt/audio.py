@@ -0,0 +1,115 @@
+"""
+Analysis of uploaded recordings: duration and whether there is enough silence at the start and end.
+
+PCM wav files are streamed in chunks and analyzed with numpy. The energy is computed in the same way
+as librosa.effects.split (centered frames of FRAME_LENGTH samples every HOP_LENGTH samples, mono mixdown,
+frames are silent if they are more than TOP_DB below the loudest frame), but only the frames near the
+start and the end are checked against the threshold. Other formats fall back to librosa.
+"""
+import numpy as np
+import wave
+
+
+TOP_DB = 20
+FRAME_LENGTH = 2048
+HOP_LENGTH = 512
+# Recordings need at least this much silence (in seconds) at the start and end
+START_SILENCE = 0.3
+END_SILENCE = 0.2
+# Number of frames read from the file at once, a multiple of HOP_LENGTH
+CHUNK_FRAMES = HOP_LENGTH * 256
+
+
+def to_mono(data, nchannels, sampwidth):
+    """
+    Converts raw little endian PCM data to a mono float array
+    """
+    if sampwidth == 1:
+        samples = np.frombuffer(data, dtype=np.uint8).astype(np.float64) - 128
+    elif sampwidth == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+        samples = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16))
+        samples = np.where(samples >= 1 << 23, samples - (1 << 24), samples).astype(np.float64)
+    else:
+        samples = np.frombuffer(data, dtype=f'<i{sampwidth}').astype(np.float64)
+    return samples.reshape(-1, nchannels).mean(axis=1)
+
+
+def block_energies(wav):
+    """
+    Streams the open wave.Wave_read and returns the sum of squares of every block of HOP_LENGTH samples
+    and the total number of samples
+    """
+    nchannels, sampwidth = wav.getnchannels(), wav.getsampwidth()
+    energies = []
+    nsamples = 0
+    while True:
+        data = wav.readframes(CHUNK_FRAMES)
+        y = to_mono(data[:len(data) - len(data) % (nchannels * sampwidth)], nchannels, sampwidth)
+        if len(y) == 0:
+            break
+        nsamples += len(y)
+        pad = -len(y) % HOP_LENGTH
+        y = np.pad(y, (0, pad))
+        energies.append(np.square(y).reshape(-1, HOP_LENGTH).sum(axis=1))
+    if not energies:
+        return np.zeros(0), 0
+    return np.concatenate(energies), nsamples
+
+
+def analyze_pcm(file):
+    """
+    Returns (length, start_invalid, end_invalid) of a PCM wav file
+    """
+    with wave.open(file, 'rb') as wav:
+        sr = wav.getframerate()
+        energies, nsamples = block_energies(wav)
+    length = nsamples / sr
+    nblocks = len(energies)
+    if nblocks == 0:
+        return length, False, False
+
+    # Frame i is centered on sample i * HOP_LENGTH and covers the blocks i-2 .. i+1
+    half = FRAME_LENGTH // HOP_LENGTH // 2
+    nframes = 1 + nsamples // HOP_LENGTH
+    cumulative = np.concatenate([[0.0], np.cumsum(energies)])
+    frames = np.arange(nframes)
+    frame_energy = cumulative[np.minimum(frames + half, nblocks)] - cumulative[np.maximum(frames - half, 0)]
+    reference = frame_energy.max()
+    if reference <= 0:
+        # Pure silence, librosa does not find any non silent section either
+        return length, False, False
+    threshold = reference * 10 ** (-TOP_DB / 10)
+
+    start_frames = frame_energy[frames * HOP_LENGTH < START_SILENCE * sr]
+    start_invalid = bool((start_frames > threshold).any())
+    end_frames = frame_energy[np.minimum((frames + 1) * HOP_LENGTH, nsamples) > nsamples - END_SILENCE * sr]
+    end_invalid = bool((end_frames > threshold).any())
+    return length, start_invalid, end_invalid
+
+
+def analyze_librosa(file):
+    """
+    Returns (length, start_invalid, end_invalid) for formats which are not supported by the wave module
+    """
+    # librosa is slow to import, so it is only loaded if it is actually needed
+    import librosa
+    y, sr = librosa.load(file, sr=None)
+    length = librosa.get_duration(y=y, sr=sr)
+    non_mute_sections = librosa.effects.split(y, top_db=TOP_DB)
+    if len(non_mute_sections) == 0:
+        return length, False, False
+    start_invalid = non_mute_sections[0][0] / sr < START_SILENCE
+    end_invalid = non_mute_sections[-1][1] / sr > length - END_SILENCE
+    return length, bool(start_invalid), bool(end_invalid)
+
+
+def analyze(file):
+    """
+    Returns (length, start_invalid, end_invalid) of the given audio file
+    """
+    try:
+        return analyze_pcm(file)
+    except (wave.Error, EOFError):
+        file.seek(0)
+        return analyze_librosa(file)
@@ -0,0 +1,112 @@
+"""
+Pluggable runners for background jobs, e.g. the audio analysis after a SentenceRecording upload.
+
+The runner is selected with the JOB_RUNNER setting (dotted path to one of the classes below):
+- ThreadRunner (default): runs jobs in an in-process thread pool once the current transaction is committed
+- DatabaseRunner: stores jobs in the Job table, they are processed by the 'runjobs' management command
+- SyncRunner: runs jobs immediately on the calling thread
+
+Jobs are module level functions which take JSON serializable arguments.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import module_loading, timezone
+from concurrent import futures
+import logging, threading, traceback
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_path(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def run(path, args):
+    """
+    Executes the job given by its dotted path. Exceptions are logged and returned as a traceback string.
+    """
+    try:
+        module_loading.import_string(path)(*args)
+    except Exception:
+        error = traceback.format_exc()
+        logger.error(f'Job {path}{tuple(args)} failed:\n{error}')
+        return error
+    return None
+
+
+class SyncRunner:
+
+    def enqueue(self, path, args):
+        error = run(path, args)
+        if error is not None:
+            raise RuntimeError(error)
+
+
+class ThreadRunner:
+
+    _executor = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_executor(cls):
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = futures.ThreadPoolExecutor(max_workers=settings.JOB_WORKERS, thread_name_prefix='job')
+            return cls._executor
+
+    @staticmethod
+    def run_in_thread(path, args):
+        try:
+            run(path, args)
+        finally:
+            # Each worker thread has its own connections, they must not be left open
+            connections.close_all()
+
+    def enqueue(self, path, args):
+        # The job has to see the data of the current transaction, so wait for the commit
+        transaction.on_commit(lambda: self.get_executor().submit(self.run_in_thread, path, args))
+
+
+class DatabaseRunner:
+
+    def enqueue(self, path, args):
+        Job = apps.get_model('recordingmgmt', 'Job')
+        Job.objects.create(func=path, args=list(args))
+
+
+def get_runner():
+    return module_loading.import_string(settings.JOB_RUNNER)()
+
+
+def enqueue(func, *args):
+    get_runner().enqueue(get_path(func), args)
+
+
+def process_next():
+    """
+    Claims and runs the oldest pending Job. Returns False if there was nothing to do.
+    """
+    Job = apps.get_model('recordingmgmt', 'Job')
+    for job in Job.objects.filter(status=Job.Status.PENDING)[:10]:
+        # Claiming with a conditional update prevents two workers from running the same job
+        if Job.objects.filter(pk=job.pk, status=Job.Status.PENDING).update(status=Job.Status.RUNNING) == 0:
+            continue
+        error = run(job.func, job.args)
+        job.status = Job.Status.DONE if error is None else Job.Status.FAILED
+        job.error = error or ''
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        return True
+    return False
+
+
+def analyze_sentence_recording(srec_id):
+    SentenceRecording = apps.get_model('recordingmgmt', 'SentenceRecording')
+    try:
+        srec = SentenceRecording.objects.get(pk=srec_id)
+    except SentenceRecording.DoesNotExist:
+        # The recording was deleted in the meantime
+        return
+    srec.analyze()
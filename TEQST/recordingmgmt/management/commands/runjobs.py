@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from recordingmgmt import jobs
+import time
+
+
+class Command(BaseCommand):
+    help = 'Processes the background jobs queued by the DatabaseRunner'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit as soon as the queue is empty')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **kwargs):
+        processed = 0
+        while True:
+            if jobs.process_next():
+                processed += 1
+                continue
+            if kwargs['once']:
+                break
+            time.sleep(kwargs['interval'])
+        self.stdout.write("Processed " + str(processed) + " jobs.")
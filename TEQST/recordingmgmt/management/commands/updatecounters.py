@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+from textmgmt import models as t_models
+from recordingmgmt import models as r_models
+
+
+class Command(BaseCommand):
+    help = 'Backfills the materialized Text.sentence_total and TextRecording.srec_count counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Only report wrong counters, fail if there are any')
+
+    def handle(self, *args, **kwargs):
+        verify = kwargs['verify']
+        wrong = 0
+
+        texts = t_models.Text.objects.annotate(count=models.Count('sentences')).order_by()
+        for text in texts.exclude(sentence_total=models.F('count')):
+            self.stdout.write(f"Text {text.id}: sentence_total is {text.sentence_total}, should be {text.count}")
+            if not verify:
+                text.update_sentence_total()
+            wrong += 1
+
+        trecs = r_models.TextRecording.objects.annotate(count=models.Count('srecs')).order_by()
+        for trec in trecs.exclude(srec_count=models.F('count')):
+            self.stdout.write(f"TextRecording {trec.id}: srec_count is {trec.srec_count}, should be {trec.count}")
+            if not verify:
+                trec.update_srec_count()
+            wrong += 1
+
+        if verify and wrong > 0:
+            raise CommandError(str(wrong) + " counters are wrong.")
+        if verify:
+            self.stdout.write("All counters are correct.")
+        else:
+            self.stdout.write(str(wrong) + " counters were fixed.")
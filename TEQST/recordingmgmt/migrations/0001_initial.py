@@ -0,0 +1,57 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:00
+
+from django.db import migrations, models
+import django.utils.timezone
+import recordingmgmt.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SentenceRecording',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audiofile', models.FileField(upload_to=recordingmgmt.models.sentence_rec_upload_path)),
+                ('length', models.FloatField(default=0.0)),
+                ('last_updated', models.DateTimeField(default=django.utils.timezone.now)),
+                ('legacy', models.BooleanField(default=True)),
+                ('valid', models.CharField(choices=[('VALID', 'Valid'), ('INVALID_START', 'Invalid Start'), ('INVALID_END', 'Invalid End'), ('INVALID_START_END', 'Invalid Start End')], default='VALID', max_length=50)),
+            ],
+            options={
+                'ordering': ['recording', 'sentence'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SentenceRecordingBackup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audiofile', models.FileField(upload_to=recordingmgmt.models.sentence_rec_backup_upload_path)),
+                ('length', models.FloatField()),
+                ('last_updated', models.DateTimeField()),
+                ('valid', models.CharField(choices=[('VALID', 'Valid'), ('INVALID_START', 'Invalid Start'), ('INVALID_END', 'Invalid End'), ('INVALID_START_END', 'Invalid Start End')], default='VALID', max_length=50)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TextRecording',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('TTS_permission', models.BooleanField(default=True)),
+                ('SR_permission', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_updated_old', models.DateTimeField(auto_now=True)),
+                ('rec_time_without_rep_old', models.FloatField(default=0.0)),
+                ('rec_time_with_rep_old', models.FloatField(default=0.0)),
+                ('audiofile', models.FileField(blank=True, upload_to=recordingmgmt.models.text_rec_upload_path)),
+                ('stmfile', models.FileField(blank=True, upload_to=recordingmgmt.models.stm_upload_path)),
+            ],
+            options={
+                'ordering': ['text', 'speaker'],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('recordingmgmt', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('textmgmt', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='textrecording',
+            name='speaker',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='textrecording',
+            name='text',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='textrecording', to='textmgmt.text'),
+        ),
+        migrations.AddField(
+            model_name='sentencerecordingbackup',
+            name='recording',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='backups', to='recordingmgmt.sentencerecording'),
+        ),
+        migrations.AddField(
+            model_name='sentencerecording',
+            name='recording',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='srecs', to='recordingmgmt.textrecording'),
+        ),
+        migrations.AddField(
+            model_name='sentencerecording',
+            name='sentence',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='srecs', to='textmgmt.sentence'),
+        ),
+        migrations.AddConstraint(
+            model_name='textrecording',
+            constraint=models.UniqueConstraint(fields=('speaker', 'text'), name='unique_trec'),
+        ),
+        migrations.AddConstraint(
+            model_name='sentencerecording',
+            constraint=models.UniqueConstraint(fields=('recording', 'sentence'), name='unique_srec'),
+        ),
+    ]
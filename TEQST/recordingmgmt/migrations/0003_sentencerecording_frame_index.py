@@ -0,0 +1,23 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordingmgmt', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sentencerecording',
+            name='frame_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sentencerecording',
+            name='frame_offset',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
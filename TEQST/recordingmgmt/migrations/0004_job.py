@@ -0,0 +1,42 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordingmgmt', '0003_sentencerecording_frame_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('func', models.CharField(max_length=200)),
+                ('args', models.JSONField(default=list)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='sentencerecording',
+            name='valid',
+            field=models.CharField(choices=[('VALID', 'Valid'), ('INVALID_START', 'Invalid Start'), ('INVALID_END', 'Invalid End'), ('INVALID_START_END', 'Invalid Start End'), ('PENDING', 'Pending')], default='VALID', max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='sentencerecordingbackup',
+            name='valid',
+            field=models.CharField(choices=[('VALID', 'Valid'), ('INVALID_START', 'Invalid Start'), ('INVALID_END', 'Invalid End'), ('INVALID_START_END', 'Invalid Start End'), ('PENDING', 'Pending')], default='VALID', max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'created_at'], name='recordingmg_status_51fa64_idx'),
+        ),
+    ]
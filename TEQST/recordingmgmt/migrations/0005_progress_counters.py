@@ -0,0 +1,18 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordingmgmt', '0004_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='textrecording',
+            name='srec_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
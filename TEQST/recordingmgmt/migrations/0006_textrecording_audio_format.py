@@ -0,0 +1,23 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordingmgmt', '0005_progress_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='textrecording',
+            name='framerate',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='textrecording',
+            name='nchannels',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
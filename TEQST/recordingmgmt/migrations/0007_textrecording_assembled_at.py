@@ -0,0 +1,18 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordingmgmt', '0006_textrecording_audio_format'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='textrecording',
+            name='assembled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
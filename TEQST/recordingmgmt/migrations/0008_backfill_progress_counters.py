@@ -0,0 +1,35 @@
+from django.db import migrations, models
+from django.db.models import functions
+
+
+def count(model, field):
+    """
+    Returns the number of `model` rows which reference the outer row by `field`
+    """
+    rows = model.objects.filter(**{field: models.OuterRef('pk')}).order_by().values(field)
+    return functions.Coalesce(models.Subquery(rows.annotate(count=models.Count('pk')).values('count')), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    """
+    Same as Text.update_sentence_total and TextRecording.update_srec_count for all existing rows,
+    otherwise every existing recording counts as finished. See also the updatecounters command.
+    """
+    Text = apps.get_model('textmgmt', 'Text')
+    Sentence = apps.get_model('textmgmt', 'Sentence')
+    TextRecording = apps.get_model('recordingmgmt', 'TextRecording')
+    SentenceRecording = apps.get_model('recordingmgmt', 'SentenceRecording')
+    Text.objects.update(sentence_total=count(Sentence, 'text'))
+    TextRecording.objects.update(srec_count=count(SentenceRecording, 'recording'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordingmgmt', '0007_textrecording_assembled_at'),
+        ('textmgmt', '0006_speakerlog'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,12 @@
-from django.db import NotSupportedError, models, utils
+from django.db import NotSupportedError, models, transaction, utils
+from django.db.models import functions
 from django.core.files import base
 from django.core.files.storage import default_storage
 from django.contrib import auth
 from django.utils import timezone
 from textmgmt import models as text_models, permissions as text_permissions
-from . import storages
-from .utils import format_timestamp
+from . import assembly, audio, jobs, storages
 import wave, re
-import librosa
-from pathlib import Path
 
 
 def get_normalized_filename(instance):
@@ -29,6 +27,37 @@ def stm_upload_path(instance, filename):
     return f'{sf_path}/STM/{name}.stm'
 
 
+class TextRecordingQuerySet(models.QuerySet):
+
+    def with_times(self):
+        """
+        Annotates the values of the properties rec_time_without_rep, rec_time_with_rep and last_updated,
+        so they don't need their own queries for every TextRecording
+        """
+        srecs = SentenceRecording.objects.filter(recording=models.OuterRef('pk')).order_by().values('recording')
+        new_srecs = srecs.filter(legacy=False)
+        new_time = new_srecs.annotate(total_time=models.Sum('length')).values('total_time')
+        reps = SentenceRecordingBackup.objects.filter(recording__recording=models.OuterRef('pk')).order_by() \
+            .values('recording__recording').annotate(total_time=models.Sum('length')).values('total_time')
+        last_updated = srecs.annotate(last_updated=models.Max('last_updated')).values('last_updated')
+
+        zero = models.Value(0.0, output_field=models.FloatField())
+        return self.annotate(
+            annotated_rec_time_without_rep=models.F('rec_time_without_rep_old')
+                + functions.Coalesce(models.Subquery(new_time, output_field=models.FloatField()), zero),
+        ).annotate(
+            # Old repetitions are not recorded, hence the recovery method
+            annotated_rec_time_with_rep=models.F('annotated_rec_time_without_rep')
+                + functions.Coalesce(models.Subquery(reps, output_field=models.FloatField()), zero)
+                + models.F('rec_time_with_rep_old') - models.F('rec_time_without_rep_old'),
+            annotated_last_updated=models.Case(
+                models.When(models.Exists(new_srecs), then=models.Subquery(last_updated)),
+                default=functions.Coalesce('last_updated_old', 'created_at'),
+                output_field=models.DateTimeField(),
+            ),
+        )
+
+
 class TextRecording(models.Model):
     """
     Acts as a relation between a user and a text and saves all information that are specific to that recording. 
@@ -47,12 +76,22 @@ class TextRecording(models.Model):
     rec_time_with_rep_old = models.FloatField(default=0.0)
     
     audiofile = models.FileField(upload_to=text_rec_upload_path, blank=True)
+    # No longer written, the stm entries are generated from the frame index, see textmgmt/stm.py
     stmfile = models.FileField(upload_to=stm_upload_path, blank=True)
+    # Format of the assembled audiofile, set by assemble_audiofile
+    framerate = models.IntegerField(null=True, blank=True)
+    nchannels = models.IntegerField(null=True, blank=True)
+    # Time of the last assembly of the audiofile, part of the download fingerprint of the shared folder
+    assembled_at = models.DateTimeField(null=True, blank=True)
+
+    # Materialized number of SentenceRecordings, maintained by SentenceRecording.save and signals.py
+    srec_count = models.IntegerField(default=0)
+
+    objects = TextRecordingQuerySet.as_manager()
 
     def save(self, *args, **kwargs):
         if self._state.adding:
             self.audiofile.save('name', base.ContentFile(b''), save=False)
-            self.stmfile.save('name', base.ContentFile(b''), save=False)
         super().save(*args, **kwargs)
 
     class Meta:
@@ -61,8 +100,12 @@ class TextRecording(models.Model):
             models.UniqueConstraint(fields=['speaker', 'text'], name='unique_trec'),
         ]
 
+    # The properties use the annotations of TextRecordingQuerySet.with_times if they are present
+
     @property # Replaces model field, hence the property
     def last_updated(self):
+        if hasattr(self, 'annotated_last_updated'):
+            return self.annotated_last_updated
         if self.srecs.filter(legacy=False).exists(): # If there are new timestamps, use those
             try:
                 last_updated = self.srecs.aggregate(last_updated=models.Max('last_updated'))['last_updated']
@@ -79,12 +122,16 @@ class TextRecording(models.Model):
         
     @property # Replaces model field, hence the property
     def rec_time_without_rep(self):
+        if hasattr(self, 'annotated_rec_time_without_rep'):
+            return self.annotated_rec_time_without_rep
         if not self.srecs.filter(legacy=False).exists():
             return self.rec_time_without_rep_old
         return self.rec_time_without_rep_old + self.srecs.filter(legacy=False).aggregate(total_time=models.Sum('length'))['total_time']
 
     @property # Replaces model field, hence the property
     def rec_time_with_rep(self):
+        if hasattr(self, 'annotated_rec_time_with_rep'):
+            return self.annotated_rec_time_with_rep
         reps = SentenceRecordingBackup.objects.filter(recording__recording=self) \
             .aggregate(total_time=models.Sum('length'))['total_time']
         # Old repetitions are not recorded, hence the recovery method
@@ -103,11 +150,7 @@ class TextRecording(models.Model):
 
     #Used for permission checks
     def is_listener(self, user):
-        perm_qs = text_permissions.get_listener_permissions(self.text.shared_folder, user)
-        for perm in perm_qs:
-            if perm.contains_speaker(self.speaker):
-                return True
-        return False
+        return self.speaker_id in text_permissions.get_visible_speakers(self.text.shared_folder, user)
 
     def is_below_root(self, root):
         return self.text.is_below_root(root)
@@ -115,16 +158,55 @@ class TextRecording(models.Model):
     def is_below_dl_root(self, download):
         return self.text.is_below_dl_root(download)
 
+    @classmethod
+    def owner_filter(cls, user, prefix=''):
+        return text_models.Text.owner_filter(user, f'{prefix}text__')
+
+    @classmethod
+    def speaker_filter(cls, user, prefix=''):
+        return models.Q(**{f'{prefix}speaker': user})
+
+    @classmethod
+    def listener_filter(cls, user, prefix=''):
+        """
+        A recording is visible if any listener permission above its text contains its speaker
+        """
+        q = models.Q(pk__in=[])
+        perms = text_models.ListenerPermission.objects.filter(listeners=user).select_related('folder').prefetch_related('speakers')
+        for perm in perms:
+            in_folder = text_models.subtree_filter([perm.folder.tree_path], f'{prefix}text__shared_folder__')
+            if perm.all_speakers:
+                q |= in_folder
+            else:
+                q |= in_folder & (models.Q(**{f'{prefix}speaker__in': [speaker.pk for speaker in perm.speakers.all()]})
+                                  | models.Q(**{f'{prefix}speaker__accent__in': perm.accents}))
+        return q
+
+    @classmethod
+    def below_root_filter(cls, root, prefix=''):
+        return text_models.Text.below_root_filter(root, f'{prefix}text__')
+
     def get_audio_filename(self):
         return get_normalized_filename(self)
 
     def active_sentence(self):
-        sentence_num = self.srecs.count() + 1
+        sentence_num = self.srec_count + 1
         # if a speaker is finished with a text this number is one higher than the number of sentences in the text
         return sentence_num
     
     def is_finished(self):
-        return self.srecs.count() >= self.text.sentence_count()
+        return self.srec_count >= self.text.sentence_count()
+
+    def update_srec_count(self):
+        """
+        Recomputes the materialized srec_count. Returns True if it was wrong.
+        """
+        count = self.srecs.count()
+        if count == self.srec_count:
+            return False
+        self.srec_count = count
+        super().save(update_fields=['srec_count'])
+        return True
     
     def get_progress(self):
         """
@@ -132,51 +214,23 @@ class TextRecording(models.Model):
         """
         return (self.active_sentence() - 1, self.text.sentence_count())
 
-    def create_stm(self):
+    def assemble_audiofile(self, changed=None):
+        """
+        Assembles the full audiofile of this recording, the stm entries are generated from its frame index on download.
+        If `changed` is given, only that SentenceRecording is spliced into the existing audiofile.
+        """
         self.text.shared_folder.add_user_to_log(self.speaker)
 
-        #create string with encoded userdata
-        user_str = f'<{self.speaker.gender},{self.speaker.education},'
-        if self.SR_permission:
-            user_str += 'SR'
-        if self.TTS_permission:
-            user_str += 'TTS'
-        user_str += f',{self.speaker.country},{self.speaker.accent}>'
-        username = self.speaker.username
-        current_timestamp = 0
-        sentences = self.text.get_content()
-        wav_path_rel = Path(self.audiofile.name).stem
-
-        # accessing files from their FileFields in write mode under the use of the GoogleCloudStorage from django-storages
-        # causes errors. Opening files in write mode from the storage works.
-        with default_storage.open(self.stmfile.name, 'wb') as stm_file:
-            with default_storage.open(self.audiofile.name, 'wb') as audio_full:
-                # since the wave library internally uses python's standard open() method to open files
-                # it needs to be handed an already opened file when working with Google Cloud storage
-                wav_full = wave.open(audio_full, 'wb')
-                for srec in self.srecs.all():
-                    with srec.audiofile.open('rb') as srec_audio:
-                        wav_part = wave.open(srec_audio, 'rb')
-
-                        #On concatenating the first file: also copy all settings
-                        if current_timestamp == 0:
-                            wav_full.setparams(wav_part.getparams())
-                        duration = wav_part.getnframes() / wav_part.getframerate()
-
-                        stm_entry = wav_path_rel + '_' + username + '_' + format_timestamp(current_timestamp) + '_' + format_timestamp(current_timestamp + duration) + ' ' \
-                        + wav_path_rel + ' ' + str(wav_part.getnchannels()) + ' ' + username + ' ' + "{0:.2f}".format(current_timestamp) + ' ' + "{0:.2f}".format(current_timestamp + duration) + ' ' \
-                        + user_str + ' ' + sentences[srec.index() - 1] + '\n'
-                    
-                        stm_file.write(bytes(stm_entry, encoding='utf-8'))
-
-                        current_timestamp += duration
-
-                        #copy audio
-                        wav_full.writeframesraw(wav_part.readframes(wav_part.getnframes()))
-                        wav_part.close()
-                wav_full.close()
-        
-        self.text.shared_folder.concat_stms()
+        if changed is None:
+            params = assembly.rebuild(self)
+        else:
+            params = assembly.update(self, changed)
+
+        if params is not None:
+            self.framerate = params.framerate
+            self.nchannels = params.nchannels
+        self.assembled_at = timezone.now()
+        super().save(update_fields=['framerate', 'nchannels', 'assembled_at'])
 
 
 
@@ -198,6 +252,7 @@ class SentenceRecording(models.Model):
         INVALID_START = "INVALID_START"
         INVALID_END = "INVALID_END"
         INVALID_START_END = "INVALID_START_END"
+        PENDING = "PENDING"
 
     recording = models.ForeignKey(TextRecording, on_delete=models.CASCADE, related_name='srecs')
     sentence = models.ForeignKey(text_models.Sentence, on_delete=models.CASCADE, related_name='srecs')
@@ -213,6 +268,10 @@ class SentenceRecording(models.Model):
 
     valid = models.CharField(max_length=50, choices=Validity.choices, default=Validity.VALID)
 
+    # Position of the audio frames inside the assembled audiofile of the TextRecording, maintained by assembly.py
+    frame_offset = models.IntegerField(null=True, blank=True)
+    frame_count = models.IntegerField(null=True, blank=True)
+
     class Meta:
         ordering = ['recording', 'sentence']
         constraints = [
@@ -225,29 +284,40 @@ class SentenceRecording(models.Model):
         if self.recording.text != self.sentence.text:
             raise utils.IntegrityError('Text reference is ambiguos')
 
+        # Every save stores a new audiofile, which is analyzed in the background
+        self.valid = self.Validity.PENDING
+        adding = self._state.adding
         super().save(*args, **kwargs)
+        if adding:
+            TextRecording.objects.filter(pk=self.recording_id).update(srec_count=models.F('srec_count') + 1)
+            self.recording.refresh_from_db(fields=['srec_count'])
+        jobs.enqueue(jobs.analyze_sentence_recording, self.pk)
 
+    def analyze(self):
+        """
+        Sets length and validity of the audiofile and assembles the TextRecording once it is finished.
+        This runs as a background job after every save.
+        """
         with default_storage.open(self.audiofile.name) as af:
-            y, sr = librosa.load(af, sr=None)
-        length = librosa.get_duration(y=y, sr=sr)
-        self.length = length
-        nonMuteSections = librosa.effects.split(y, 20)
-        if len(nonMuteSections) != 0:  # this test is is probably unnecessary
-            start_invalid = nonMuteSections[0][0] / sr < 0.3
-            end_invalid = nonMuteSections[-1][1] / sr > length - 0.2
-            if start_invalid and end_invalid:
-                self.valid = self.Validity.INVALID_START_END
-            else:
-                if start_invalid:
-                    self.valid = self.Validity.INVALID_START
-                elif end_invalid:
-                    self.valid = self.Validity.INVALID_END
-                else:
-                    self.valid = self.Validity.VALID
-            super().save()
-
-        if self.recording.is_finished():
-            self.recording.create_stm()
+            self.length, start_invalid, end_invalid = audio.analyze(af)
+        if start_invalid and end_invalid:
+            self.valid = self.Validity.INVALID_START_END
+        elif start_invalid:
+            self.valid = self.Validity.INVALID_START
+        elif end_invalid:
+            self.valid = self.Validity.INVALID_END
+        else:
+            self.valid = self.Validity.VALID
+        # Saved before the assembly, so the analysis isn't lost if the assembly fails.
+        # Bypass save(), which would enqueue this analysis again
+        super().save(update_fields=['length', 'valid'])
+
+        with transaction.atomic():
+            # Workers in other threads or processes may assemble the same audiofile,
+            # the row lock lets them take turns (a no-op on SQLite, which has to run with a single job worker)
+            trec = TextRecording.objects.select_for_update().select_related('text').get(pk=self.recording_id)
+            if trec.is_finished():
+                trec.assemble_audiofile(changed=self)
 
     #Used for permission checks
     def is_owner(self, user):
@@ -260,6 +330,18 @@ class SentenceRecording(models.Model):
     #Used for permission checks
     def is_listener(self, user):
         return self.recording.is_listener(user)
+
+    @classmethod
+    def owner_filter(cls, user, prefix=''):
+        return TextRecording.owner_filter(user, f'{prefix}recording__')
+
+    @classmethod
+    def speaker_filter(cls, user, prefix=''):
+        return TextRecording.speaker_filter(user, f'{prefix}recording__')
+
+    @classmethod
+    def listener_filter(cls, user, prefix=''):
+        return TextRecording.listener_filter(user, f'{prefix}recording__')
     
     #TODO @property ???
     def index(self):
@@ -300,3 +382,31 @@ class SentenceRecordingBackup(models.Model):
         wav.close()
         self.audiofile.close()
         return duration
+
+
+
+class Job(models.Model):
+    """
+    Queue table of the jobs.DatabaseRunner, processed by the 'runjobs' management command
+    """
+    class Status(models.TextChoices):
+        PENDING = "PENDING"
+        RUNNING = "RUNNING"
+        DONE = "DONE"
+        FAILED = "FAILED"
+
+    func = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.func}{tuple(self.args)} ({self.status})'
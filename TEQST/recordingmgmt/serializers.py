@@ -162,7 +162,7 @@ class SentenceRecordingUpdateSerializer(serializers.ModelSerializer):
                 length = instance.get_audio_length()
                 instance.recording.rec_time_with_rep_old -= length
                 instance.recording.rec_time_without_rep_old -= length
-                instance.recording.save()
+                instance.recording.save(update_fields=['rec_time_with_rep_old', 'rec_time_without_rep_old'])
                 backup.length = length #Init length for stats to read
 
             backup.save()
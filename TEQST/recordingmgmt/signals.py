@@ -0,0 +1,9 @@
+from django.db import models
+from django.dispatch import receiver
+from . import models as rec_models
+
+
+@receiver(models.signals.post_delete, sender=rec_models.SentenceRecording)
+def decrement_srec_count(sender, instance, **kwargs):
+    # Also called for cascading and queryset deletes, which bypass SentenceRecording.delete
+    rec_models.TextRecording.objects.filter(pk=instance.recording_id).update(srec_count=models.F('srec_count') - 1)
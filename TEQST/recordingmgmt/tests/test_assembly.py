@@ -0,0 +1,103 @@
+from django.test import TestCase
+from django.core.files.storage import default_storage
+from usermgmt.tests.utils import *
+from textmgmt.models import Folder, Text
+from recordingmgmt.models import TextRecording, SentenceRecording
+from recordingmgmt import assembly
+
+from unittest import mock
+import wave
+
+
+class TestAssembly(TestCase):
+    """
+    Tests the incremental assembly of TextRecording audiofiles.
+    SentenceRecordings are bulk created, so the audio analysis in SentenceRecording.save is skipped.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_languages_users_groups()
+
+    def setUp(self):
+        self.user1 = get_user(1)
+        self.user2 = get_user(2)
+        self.f1 = Folder.objects.create(name='f1', owner=self.user1).make_shared_folder()
+        # testtext.txt has exactly 3 sentences
+        self.t1 = Text.objects.create(title='text', shared_folder=self.f1, textfile='test_resources/testtext.txt')
+        self.tr1 = TextRecording.objects.create(speaker=self.user2, text=self.t1)
+        SentenceRecording.objects.bulk_create([
+            SentenceRecording(recording=self.tr1, sentence=sentence, audiofile=f'test_resources/s{sentence.index}.wav')
+            for sentence in self.t1.sentences.all()
+        ])
+
+    def tearDown(self):
+        delete_all_users()
+
+    def read_full(self):
+        with default_storage.open(self.tr1.audiofile.name, 'rb') as f:
+            wav = wave.open(f, 'rb')
+            frames = wav.readframes(wav.getnframes())
+            wav.close()
+        return frames
+
+    def test_rebuild_creates_index(self):
+        assembly.rebuild(self.tr1)
+        offset = 0
+        for srec in self.tr1.srecs.all():
+            with srec.audiofile.open('rb') as f:
+                _, nframes = assembly.read_frames(wave.open(f, 'rb'))
+            self.assertEqual(srec.frame_offset, offset)
+            self.assertEqual(srec.frame_count, nframes)
+            offset += nframes
+        with default_storage.open(self.tr1.audiofile.name, 'rb') as f:
+            self.assertEqual(wave.open(f, 'rb').getnframes(), offset)
+
+    def test_update_changed_length_matches_rebuild(self):
+        assembly.rebuild(self.tr1)
+        srec = self.tr1.srecs.get(sentence__index=2)
+        srec.audiofile = 'test_resources/s4.wav'
+        srec.save_base(update_fields=['audiofile'])
+        assembly.update(self.tr1, srec)
+        spliced = self.read_full()
+        spliced_index = list(self.tr1.srecs.values_list('frame_offset', 'frame_count'))
+
+        assembly.rebuild(self.tr1)
+        self.assertEqual(spliced, self.read_full())
+        self.assertEqual(spliced_index, list(self.tr1.srecs.values_list('frame_offset', 'frame_count')))
+
+    def test_update_appends_new_recording(self):
+        last = self.t1.sentences.get(index=3)
+        self.tr1.srecs.filter(sentence=last).delete()
+        assembly.rebuild(self.tr1)
+        SentenceRecording.objects.bulk_create([
+            SentenceRecording(recording=self.tr1, sentence=last, audiofile='test_resources/s3.wav')
+        ])
+        srec = self.tr1.srecs.get(sentence=last)
+        assembly.update(self.tr1, srec)
+        self.assertEqual(srec.frame_offset, sum(self.tr1.srecs.exclude(pk=srec.pk).values_list('frame_count', flat=True)))
+        appended = self.read_full()
+
+        assembly.rebuild(self.tr1)
+        self.assertEqual(appended, self.read_full())
+
+    def test_analyze_assembles_finished_recording(self):
+        self.tr1.update_srec_count()
+        srec = self.tr1.srecs.get(sentence__index=2)
+        srec.analyze()
+        self.tr1.refresh_from_db()
+        self.assertIsNotNone(self.tr1.assembled_at)
+        self.assertIsNotNone(self.tr1.framerate)
+
+    def test_analyze_keeps_result_if_assembly_fails(self):
+        self.tr1.update_srec_count()
+        srec = self.tr1.srecs.get(sentence__index=2)
+        with mock.patch('recordingmgmt.assembly.update', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                srec.analyze()
+        srec.refresh_from_db()
+        self.assertNotEqual(srec.valid, SentenceRecording.Validity.PENDING)
+        self.assertGreater(srec.length, 0)
+        self.tr1.refresh_from_db()
+        self.assertIsNone(self.tr1.assembled_at)
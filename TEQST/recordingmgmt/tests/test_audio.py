@@ -0,0 +1,90 @@
+from django.test import SimpleTestCase
+from django.conf import settings
+from recordingmgmt import audio
+
+import io, struct, wave
+import numpy as np
+
+
+def make_wav(signal, sr=16000, sampwidth=2, nchannels=1):
+    """
+    Creates an in-memory PCM wav file from a float signal in [-1, 1]
+    """
+    if sampwidth == 1:
+        samples = (signal * 127 + 128).astype(np.uint8)
+    else:
+        samples = (signal * (2 ** (8 * sampwidth - 1) - 1)).astype(f'<i{sampwidth}')
+    data = np.repeat(samples, nchannels).tobytes()
+    f = io.BytesIO()
+    with wave.open(f, 'wb') as wav:
+        wav.setnchannels(nchannels)
+        wav.setsampwidth(sampwidth)
+        wav.setframerate(sr)
+        wav.writeframes(data)
+    f.seek(0)
+    return f
+
+
+def tone(seconds, sr=16000):
+    t = np.arange(int(seconds * sr)) / sr
+    return 0.5 * np.sin(2 * np.pi * 440 * t)
+
+
+def silence(seconds, sr=16000):
+    return np.zeros(int(seconds * sr))
+
+
+class TestAudioAnalysis(SimpleTestCase):
+
+    def test_matches_librosa_on_test_resources(self):
+        for i in range(1, 5):
+            path = settings.MEDIA_ROOT/'test_resources'/f's{i}.wav'
+            with open(path, 'rb') as f:
+                length, start_invalid, end_invalid = audio.analyze_pcm(f)
+            with open(path, 'rb') as f:
+                lib_length, lib_start_invalid, lib_end_invalid = audio.analyze_librosa(f)
+            self.assertAlmostEqual(length, lib_length, places=3)
+            self.assertEqual((start_invalid, end_invalid), (lib_start_invalid, lib_end_invalid))
+
+    def test_valid(self):
+        f = make_wav(np.concatenate([silence(0.5), tone(1), silence(0.5)]))
+        length, start_invalid, end_invalid = audio.analyze(f)
+        self.assertAlmostEqual(length, 2.0)
+        self.assertFalse(start_invalid)
+        self.assertFalse(end_invalid)
+
+    def test_invalid_start_and_end(self):
+        f = make_wav(np.concatenate([silence(0.1), tone(1), silence(0.1)]))
+        _, start_invalid, end_invalid = audio.analyze(f)
+        self.assertTrue(start_invalid)
+        self.assertTrue(end_invalid)
+
+    def test_invalid_end_stereo(self):
+        f = make_wav(np.concatenate([silence(0.5), tone(1)]), nchannels=2)
+        _, start_invalid, end_invalid = audio.analyze(f)
+        self.assertFalse(start_invalid)
+        self.assertTrue(end_invalid)
+
+    def test_sample_widths(self):
+        signal = np.concatenate([tone(0.5), silence(0.5)])
+        for sampwidth in [1, 2, 4]:
+            _, start_invalid, end_invalid = audio.analyze(make_wav(signal, sampwidth=sampwidth))
+            self.assertTrue(start_invalid)
+            self.assertFalse(end_invalid)
+
+    def test_silence(self):
+        length, start_invalid, end_invalid = audio.analyze(make_wav(silence(1)))
+        self.assertAlmostEqual(length, 1.0)
+        self.assertFalse(start_invalid)
+        self.assertFalse(end_invalid)
+
+    def test_non_pcm_falls_back_to_librosa(self):
+        # 32 bit float wav, which the wave module can't read
+        data = np.concatenate([silence(0.5), tone(1), silence(0.5)]).astype('<f4').tobytes()
+        fmt = struct.pack('<HHIIHH', 3, 1, 16000, 16000 * 4, 4, 32)
+        f = io.BytesIO(b'RIFF' + struct.pack('<I', 4 + 8 + len(fmt) + 8 + len(data)) + b'WAVE'
+                       + b'fmt ' + struct.pack('<I', len(fmt)) + fmt + b'data' + struct.pack('<I', len(data)) + data)
+        length, start_invalid, end_invalid = audio.analyze(f)
+        self.assertAlmostEqual(length, 2.0)
+        self.assertFalse(start_invalid)
+        self.assertFalse(end_invalid)
@@ -0,0 +1,76 @@
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from usermgmt.tests.utils import *
+from textmgmt.models import Folder, Text
+from recordingmgmt.models import TextRecording, SentenceRecording
+from django.apps import apps
+
+import importlib, io
+
+
+# The DatabaseRunner only queues the audio analysis, which is not needed here
+@override_settings(JOB_RUNNER='recordingmgmt.jobs.DatabaseRunner')
+class TestProgressCounters(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_languages_users_groups()
+
+    def setUp(self):
+        self.user1 = get_user(1)
+        self.user2 = get_user(2)
+        self.f1 = Folder.objects.create(name='f1', owner=self.user1).make_shared_folder()
+        self.t1 = Text.objects.create(title='text', shared_folder=self.f1, textfile='test_resources/testtext.txt')
+        self.tr1 = TextRecording.objects.create(speaker=self.user2, text=self.t1)
+
+    def tearDown(self):
+        delete_all_users()
+
+    def record(self, index):
+        return SentenceRecording.objects.create(recording=self.tr1, sentence=self.t1.sentences.get(index=index), audiofile='test_resources/s1.wav')
+
+    def test_sentence_total(self):
+        self.assertEqual(self.t1.sentence_total, 3)
+        self.assertEqual(Text.objects.get(pk=self.t1.pk).sentence_count(), 3)
+
+    def test_srec_count(self):
+        srec = self.record(1)
+        self.assertEqual(srec.recording.srec_count, 1)
+        self.record(2)
+        self.record(3)
+        self.tr1.refresh_from_db()
+        self.assertEqual(self.tr1.active_sentence(), 4)
+        self.assertTrue(self.tr1.is_finished())
+        srec.delete()
+        self.tr1.srecs.filter(sentence__index=2).delete()
+        self.tr1.refresh_from_db()
+        self.assertEqual(self.tr1.srec_count, 1)
+        self.assertFalse(self.tr1.is_finished())
+
+    def test_updatecounters(self):
+        self.record(1)
+        TextRecording.objects.filter(pk=self.tr1.pk).update(srec_count=5)
+        Text.objects.filter(pk=self.t1.pk).update(sentence_total=0)
+        with self.assertRaises(CommandError):
+            call_command('updatecounters', verify=True, stdout=io.StringIO())
+        call_command('updatecounters', stdout=io.StringIO())
+        call_command('updatecounters', verify=True, stdout=io.StringIO())
+        self.tr1.refresh_from_db()
+        self.t1.refresh_from_db()
+        self.assertEqual(self.tr1.srec_count, 1)
+        self.assertEqual(self.t1.sentence_total, 3)
+
+    def test_backfill_migration(self):
+        # Rows which existed before the counters get the default 0
+        self.record(1)
+        TextRecording.objects.filter(pk=self.tr1.pk).update(srec_count=0)
+        Text.objects.filter(pk=self.t1.pk).update(sentence_total=0)
+        migration = importlib.import_module('recordingmgmt.migrations.0008_backfill_progress_counters')
+        migration.backfill_counters(apps, None)
+        self.tr1.refresh_from_db()
+        self.t1.refresh_from_db()
+        self.assertEqual(self.tr1.srec_count, 1)
+        self.assertEqual(self.t1.sentence_total, 3)
+        self.assertFalse(self.tr1.is_finished())
@@ -0,0 +1,76 @@
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from usermgmt.tests.utils import *
+from textmgmt.models import Folder, Text
+from recordingmgmt.models import TextRecording, SentenceRecording, Job
+from recordingmgmt import jobs
+
+import io
+
+
+CALLS = []
+
+def record_call(*args):
+    CALLS.append(args)
+
+def fail():
+    raise ValueError('job failed')
+
+
+@override_settings(JOB_RUNNER='recordingmgmt.jobs.DatabaseRunner')
+class TestDatabaseRunner(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_languages_users_groups()
+
+    def setUp(self):
+        CALLS.clear()
+
+    def tearDown(self):
+        delete_all_users()
+
+    def test_enqueue_and_process(self):
+        jobs.enqueue(record_call, 1, 'a')
+        self.assertEqual(CALLS, [])
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.Status.PENDING)
+        call_command('runjobs', once=True, stdout=io.StringIO())
+        self.assertEqual(CALLS, [(1, 'a')])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.DONE)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failing_job(self):
+        jobs.enqueue(fail)
+        jobs.enqueue(record_call, 2)
+        call_command('runjobs', once=True, stdout=io.StringIO())
+        self.assertEqual(CALLS, [(2,)])
+        failed = Job.objects.get(func=jobs.get_path(fail))
+        self.assertEqual(failed.status, Job.Status.FAILED)
+        self.assertIn('job failed', failed.error)
+
+    def test_sentence_recording_is_pending(self):
+        user1 = get_user(1)
+        user2 = get_user(2)
+        f1 = Folder.objects.create(name='f1', owner=user1).make_shared_folder()
+        t1 = Text.objects.create(title='text', shared_folder=f1, textfile='test_resources/testtext.txt')
+        tr1 = TextRecording.objects.create(speaker=user2, text=t1)
+        srec = SentenceRecording.objects.create(recording=tr1, sentence=t1.sentences.get(index=1), audiofile='test_resources/s1.wav')
+        self.assertEqual(srec.valid, SentenceRecording.Validity.PENDING)
+        job = Job.objects.get()
+        self.assertEqual(job.func, jobs.get_path(jobs.analyze_sentence_recording))
+        self.assertEqual(job.args, [srec.pk])
+
+
+@override_settings(JOB_RUNNER='recordingmgmt.jobs.SyncRunner')
+class TestSyncRunner(TestCase):
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_runs_immediately(self):
+        jobs.enqueue(record_call, 3)
+        self.assertEqual(CALLS, [(3,)])
+        self.assertFalse(Job.objects.exists())
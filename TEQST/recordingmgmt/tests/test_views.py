@@ -63,6 +63,20 @@ class TestTextRecordingView(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.json()), 1)
 
+    def test_textrecordings_GET_other_speaker(self):
+        # setup
+        user1 = get_user(1)
+        user2 = get_user(2)
+        user3 = get_user(3)
+        f1 = Folder.objects.create(name='f1', owner=user1)
+        f1 = f1.make_shared_folder()
+        t1 = Text.objects.create(title='test', shared_folder=f1, textfile='test_resources/testtext.txt')
+        f1.speaker.add(user2, user3)
+        TextRecording.objects.create(speaker=user3, text=t1)
+        # test
+        response = self.client.get(reverse("textrecs"), data={'text': t1.pk}, HTTP_AUTHORIZATION=self.token_2)
+        self.assertEqual(response.status_code, 204)
+
     def test_textrecordings_GET_without_text(self):
         response = self.client.get(reverse("textrecs"), data={}, HTTP_AUTHORIZATION=self.token_2)
         self.assertEqual(response.status_code, 404)
@@ -17,14 +17,16 @@ class TextRecordingView(generics.ListCreateAPIView):
     """
     queryset = models.TextRecording.objects.all()
     serializer_class = serializers.TextRecordingSerializer
+    permission_classes = [rf_permissions.IsAuthenticated, permissions.IsSpeaker]
+    # Only lists the recordings of request.user
+    filter_backends = [permissions.PermissionFilter]
 
     def get_queryset(self):
-        user = self.request.user
         if 'text' in self.request.query_params:
             try:
                 if not text_models.Text.objects.filter(Q(pk=self.request.query_params['text'])).exists():
                     raise exceptions.NotFound("Invalid text id")
-                return models.TextRecording.objects.filter(text=self.request.query_params['text'], speaker=user.pk)
+                return models.TextRecording.objects.filter(text=self.request.query_params['text']).with_times()
             except ValueError:
                 raise exceptions.NotFound("Invalid text id")
             # if not user in Text.objects.get(pk=self.request.query_params['text']).shared_folder.sharedfolder.speaker.all():
@@ -41,7 +43,7 @@ class TextRecordingView(generics.ListCreateAPIView):
         handles the get request
         """
         resp = super().get(*args, **kwargs)
-        if not self.get_queryset().exists():
+        if not self.filter_queryset(self.get_queryset()).exists():
             #response.status_code = status.HTTP_204_NO_CONTENT
             resp = response.Response(status=status.HTTP_204_NO_CONTENT)
         return resp
@@ -35,3 +35,6 @@ REST_FRAMEWORK['NUM_PROXIES'] = None
 DEFAULT_FOLDER = [
     #uuid.UUID('<str>'),
 ]
+
+# Runner for background jobs, see recordingmgmt/jobs.py
+#JOB_RUNNER = 'recordingmgmt.jobs.DatabaseRunner'
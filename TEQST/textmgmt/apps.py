@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class TextmgmtConfig(AppConfig):
     name = 'textmgmt'
+
+    def ready(self):
+        from . import signals
+        if settings.PRELOAD_SENTENCE_TOKENIZERS:
+            from . import utils
+            utils.preload_sentence_tokenizers()
@@ -0,0 +1,272 @@
+"""
+Benchmarks for the main REST API endpoints, run with "python manage.py benchmark".
+
+A synthetic corpus is seeded for every scale and each endpoint is measured for its number of database queries,
+wall time and peak memory (measured with tracemalloc in a separate run, since tracing slows down the code).
+Recordings reference the wav files in media/test_resources. Only the finished recordings of the first
+shared folder are assembled, since the download is the only endpoint which reads the audio of a TextRecording.
+
+Standalone functions like the encoding detection and parsing of uploads are benchmarked with the same measurements.
+"""
+from django.contrib.auth import models as auth_models
+from django.core.cache import cache
+from django.core.files import base, uploadedfile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import utils as test_utils
+from django.utils import timezone
+from rest_framework import test
+from usermgmt import models as user_models
+from recordingmgmt import models as rec_models, views as rec_views
+from . import models, utils, views
+
+import chardet, statistics, time, tracemalloc
+
+
+SCALES = {
+    'tiny': {'folders': 1, 'texts': 2, 'sentences': 3, 'speakers': 2, 'downloads': 1},
+    'small': {'folders': 2, 'texts': 5, 'sentences': 5, 'speakers': 5, 'downloads': 2},
+    'medium': {'folders': 4, 'texts': 20, 'sentences': 10, 'speakers': 20, 'downloads': 4},
+    'large': {'folders': 8, 'texts': 50, 'sentences': 15, 'speakers': 50, 'downloads': 8},
+}
+
+WAVS = [f'test_resources/s{i}.wav' for i in range(1, 5)]
+
+USER_DATA = {'gender': 'M', 'birth_year': 1990, 'education': 'M12', 'accent': 'none', 'country': 'USA'}
+
+
+class Corpus:
+    """
+    Seeds a synthetic corpus of the given scale and keeps references to the objects the benchmarks need
+    """
+
+    def __init__(self, name, scale):
+        self.name = name
+        self.scale = scale
+        self.publisher = user_models.CustomUser.objects.create_user(f'{name}_pub', password=None, **USER_DATA)
+        self.publisher.groups.add(auth_models.Group.objects.get_or_create(name='Publisher')[0])
+        self.speakers = [
+            user_models.CustomUser.objects.create_user(f'{name}_spk{i}', password=None, **USER_DATA)
+            for i in range(scale['speakers'])
+        ]
+        self.uploader = user_models.CustomUser.objects.create_user(f'{name}_upload', password=None, **USER_DATA)
+
+        self.root = models.Folder.objects.create(name=name, owner=self.publisher)
+        self.sharedfolders = []
+        for i in range(scale['folders']):
+            sf = models.Folder.objects.create(name=f'sf{i}', owner=self.publisher, parent=self.root).make_shared_folder()
+            sf.speaker.set(self.speakers + [self.uploader])
+            self.sharedfolders.append(sf)
+            for j in range(scale['texts']):
+                content = '\n\n'.join(f'This is sentence {k} of text {j}.' for k in range(scale['sentences']))
+                text = models.Text.objects.create(title=f'text{j}', shared_folder=sf,
+                                                  textfile=base.ContentFile(content.encode('utf-8'), name=f'text{j}.txt'))
+                self.record(sf, text, assemble=(i == 0))
+        self.sharedfolder = self.sharedfolders[0]
+        self.text = self.sharedfolder.text.first()
+        self.upload_texts = list(self.sharedfolder.text.all())
+        self.upload_trec = None
+
+    def record(self, sf, text, assemble):
+        """
+        Every speaker has recorded a different number of sentences of the text, some are finished.
+        At most scale['downloads'] TextRecordings per folder are finished and assembled.
+        """
+        sentences = list(text.sentences.all())
+        finished = rec_models.TextRecording.objects.filter(text__shared_folder=sf, srec_count=len(sentences)).count()
+        for i, speaker in enumerate(self.speakers):
+            count = (i * 7 + text.id) % (len(sentences) + 1)
+            if i == 0 and finished < self.scale['downloads']:
+                count = len(sentences)
+            elif count == len(sentences) and finished >= self.scale['downloads']:
+                count -= 1
+            if count == 0:
+                continue
+            trec = rec_models.TextRecording.objects.create(speaker=speaker, text=text, TTS_permission=True, SR_permission=True)
+            rec_models.SentenceRecording.objects.bulk_create([
+                rec_models.SentenceRecording(recording=trec, sentence=sentence, audiofile=WAVS[k % len(WAVS)],
+                                             length=3.0 + k % len(WAVS), legacy=False, last_updated=timezone.now())
+                for k, sentence in enumerate(sentences[:count])
+            ])
+            trec.update_srec_count()
+            if count == len(sentences):
+                finished += 1
+                if assemble:
+                    trec.assemble_audiofile()
+
+    def next_upload(self):
+        """
+        Returns (TextRecording, index) for the next sentence the uploader can record
+        """
+        if self.upload_trec is not None:
+            self.upload_trec.refresh_from_db(fields=['srec_count'])
+        if self.upload_trec is None or self.upload_trec.is_finished():
+            text = self.upload_texts.pop(0)
+            self.upload_trec = rec_models.TextRecording.objects.create(speaker=self.uploader, text=text,
+                                                                        TTS_permission=True, SR_permission=True)
+        return self.upload_trec, self.upload_trec.active_sentence()
+
+
+def get_request(view, user, kwargs=None, params=None):
+    def prepare(corpus):
+        request = test.APIRequestFactory().get('/', params or {})
+        test.force_authenticate(request, user=user(corpus))
+        return view, request, kwargs(corpus) if kwargs else {}
+    return prepare
+
+
+def download_request(corpus):
+    # Forces the archive to be created again instead of serving the cached one
+    models.SharedFolder.objects.filter(pk=corpus.sharedfolder.pk).update(download_fingerprint='')
+    return get_request(views.SpeechDataDownloadView, lambda c: c.publisher, lambda c: {'pk': c.sharedfolder.pk})(corpus)
+
+
+def upload_request(corpus):
+    trec, index = corpus.next_upload()
+    with default_storage.open(WAVS[index % len(WAVS)], 'rb') as f:
+        audiofile = base.ContentFile(f.read(), name='upload.wav')
+    request = test.APIRequestFactory().post('/', {'recording': trec.pk, 'index': index, 'audiofile': audiofile}, format='multipart')
+    test.force_authenticate(request, user=corpus.uploader)
+    return rec_views.SentenceRecordingCreateView, request, {}
+
+
+def folderstats_request(corpus):
+    now = timezone.now()
+    return get_request(views.PubFolderStatsView, lambda c: c.publisher, lambda c: {'pk': c.root.pk},
+                       {'month': now.month, 'year': now.year})(corpus)
+
+
+ENDPOINTS = {
+    'pub_sharedfolder_stats': get_request(views.PubSharedFolderStatsView, lambda c: c.publisher, lambda c: {'pk': c.sharedfolder.pk}),
+    'pub_text_stats': get_request(views.PubTextStatsView, lambda c: c.publisher, lambda c: {'pk': c.text.pk}),
+    'spk_sharedfolder_texts': get_request(views.SpkTextListView, lambda c: c.speakers[0], lambda c: {'pk': c.sharedfolder.pk}),
+    'spk_sentencerecording_upload': upload_request,
+    'pub_download': download_request,
+    'pub_folderstats_export': folderstats_request,
+}
+
+
+def call(prepare, corpus):
+    """
+    Calls the endpoint and consumes the complete response. Returns (status_code, response size)
+    """
+    view, request, kwargs = prepare(corpus)
+    # Throttling would reject the repeated requests
+    response = view.as_view(throttle_classes=[])(request, **kwargs)
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        if hasattr(response, 'render'):
+            response.render()
+        size = len(response.content)
+    response.close()
+    return response.status_code, size
+
+
+def measure(func, repeat):
+    """
+    Calls func repeat times and once more with tracemalloc. Returns the last return value of func and the measurements.
+    The cache is cleared before every call, otherwise the cached stats would be measured instead of computing them.
+    """
+    times = []
+    queries = []
+    for _ in range(repeat):
+        cache.clear()
+        with test_utils.CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            result = func()
+            times.append((time.perf_counter() - start) * 1000)
+        queries.append(len(ctx.captured_queries))
+
+    cache.clear()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, {
+        'queries': max(queries),
+        'time_ms': {'min': min(times), 'median': statistics.median(times), 'max': max(times)},
+        'peak_memory_kb': peak / 1024,
+    }
+
+
+def run_scale(name, scale, repeat=3, endpoints=None):
+    """
+    Seeds a corpus for the scale and returns a list of results, one per endpoint
+    """
+    corpus = Corpus(f'bench_{name}', scale)
+    results = []
+    for endpoint, prepare in ENDPOINTS.items():
+        if endpoints is not None and endpoint not in endpoints:
+            continue
+        (status_code, size), measurements = measure(lambda: call(prepare, corpus), repeat)
+        result = {'scale': name, 'endpoint': endpoint, 'status': status_code, 'response_bytes': size}
+        result.update(measurements)
+        results.append(result)
+    return results
+
+
+def encoding_inputs(size=1024 * 1024):
+    """
+    Returns (name, content) of the texts in media/test_resources and of large synthetic files
+    """
+    inputs = []
+    for path in sorted(default_storage.listdir('test_resources')[1]):
+        if path.endswith('.txt'):
+            with default_storage.open(f'test_resources/{path}', 'rb') as f:
+                inputs.append((path, f.read()))
+    paragraph = 'Grüße aus Köln, das Wetter ist schön. Ça va très bien, merci.\n\n'
+    content = paragraph * (size // len(paragraph.encode('utf-8')))
+    inputs.append(('synthetic_utf8', content.encode('utf-8')))
+    inputs.append(('synthetic_utf8_bom', content.encode('utf-8-sig')))
+    inputs.append(('synthetic_cp1252', content.encode('cp1252')))
+    return inputs
+
+
+def run_encoding_detection(repeat=3):
+    """
+    Compares utils.detect_encoding with chardet over the complete content, which was used before
+    """
+    results = []
+    for name, content in encoding_inputs():
+        encoding, measurements = measure(lambda: utils.detect_encoding(content), repeat)
+        # chardet is slow on large files, it is only timed once
+        start = time.perf_counter()
+        chardet_encoding = chardet.detect(content)['encoding']
+        chardet_time = (time.perf_counter() - start) * 1000
+        result = {'scale': 'ingest', 'endpoint': f'detect_encoding[{name}]', 'response_bytes': len(content),
+                  'encoding': encoding, 'chardet_encoding': chardet_encoding, 'chardet_time_ms': chardet_time}
+        result.update(measurements)
+        results.append(result)
+    return results
+
+
+def run_text_parsing(repeat=3, sizes=(1, 8)):
+    """
+    Measures utils.parse_file and utils.split_lines on synthetic uploads of the given sizes in MiB.
+    The peak memory of the parser should not grow with the file size beyond the size of the result.
+    """
+    results = []
+    paragraph = 'Grüße aus Köln, das Wetter ist schön.\r\nÇa va très bien, merci.\r\n\r\n'
+    for size in sizes:
+        content = (paragraph * (size * 1024 * 1024 // len(paragraph.encode('utf-8')))).encode('utf-8')
+        def parse():
+            textfile = uploadedfile.SimpleUploadedFile('upload.txt', content)
+            return sum(len(text) for text in utils.split_lines(utils.parse_file(textfile), max_lines=1000))
+        count, measurements = measure(parse, repeat)
+        result = {'scale': 'ingest', 'endpoint': f'parse_file[{size}MiB]', 'response_bytes': len(content), 'sentences': count}
+        result.update(measurements)
+        results.append(result)
+    return results
+
+
+def compare(old_results, new_results):
+    """
+    Returns (scale, endpoint, old result, new result) for every measurement which is in both reports
+    """
+    old = {(r['scale'], r['endpoint']): r for r in old_results}
+    return [(r['scale'], r['endpoint'], old[(r['scale'], r['endpoint'])], r)
+            for r in new_results if (r['scale'], r['endpoint']) in old]
@@ -1,6 +1,6 @@
 from django import http
 from django.views import generic
-from . import models
+from . import models, stm
 from recordingmgmt import models as rec_models
 import uuid
 
@@ -37,9 +37,13 @@ class SharedFolderFileView(generic.DetailView):
     def get(self, request, *args, **kwargs):
         obj = retrieve_instance(request, self.model.objects)
         if self.kwargs['ext'] == 'stm':
-            return http.FileResponse(obj.stmfile)
+            response = http.StreamingHttpResponse(stm.sharedfolder_stm(obj), content_type='text/plain; charset=utf-8')
+            response['Content-Disposition'] = f'inline; filename="{obj.get_stm_name()}"'
+            return response
         if self.kwargs['ext'] == 'log':
-            return http.FileResponse(obj.logfile)
+            response = http.HttpResponse(obj.render_log(), content_type='text/plain; charset=utf-8')
+            response['Content-Disposition'] = f'inline; filename="{obj.get_log_name()}"'
+            return response
         raise http.Http404(f"Illegal file type {self.kwargs['ext']}")
 
 
@@ -41,7 +41,7 @@ class FolderStatCalculator(FolderStatBase):
     directly in queries and parses it into pandas dataframes.
     """
 
-    all_folders: 'list[text_models.Folder]'
+    all_folders: 'models.QuerySet[text_models.Folder]'
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -55,12 +55,8 @@ class FolderStatCalculator(FolderStatBase):
         self.create_user_rec_stats(*args, **kwargs) 
     
     def aggregate_subfolders(self, *args, **kwargs):
-        self.all_folders = [self.root] 
-        new_folders = self.root.subfolder.all()
-        # This loops over directory levels, so we assume the number of iterations to be short
-        while new_folders.exists():
-            self.all_folders.extend(new_folders)
-            new_folders = text_models.Folder.objects.filter(parent__in=new_folders)
+        # The subtree is used as a subquery in the queries below
+        self.all_folders = self.root.descendants(include_self=True).values('pk')
 
     def calculate_word_total(self, *args, **kwargs):
         # Calculate total word count
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings, runner
+from textmgmt import benchmarks
+
+import datetime, json, platform, shutil, subprocess, tempfile
+from pathlib import Path
+
+
+class Command(BaseCommand):
+    help = 'Measures query counts, wall time and peak memory of the main API endpoints on synthetic corpora'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', nargs='+', choices=benchmarks.SCALES.keys(), default=['small'])
+        parser.add_argument('--endpoint', nargs='+', choices=benchmarks.ENDPOINTS.keys(), help='Only run these endpoints')
+        parser.add_argument('--ingest', action='store_true', help='Also benchmark the encoding detection and parsing of text uploads')
+        parser.add_argument('--repeat', type=int, default=3, help='Number of timed calls per endpoint')
+        parser.add_argument('--output', help='Path of the JSON report')
+        parser.add_argument('--compare', help='JSON report of an earlier run, fails if an endpoint needs more queries now')
+
+    def get_commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def handle(self, *args, **kwargs):
+        old_report = None
+        if kwargs['compare']:
+            with open(kwargs['compare']) as f:
+                old_report = json.load(f)
+
+        results = []
+        # The corpus is seeded into a test database and a temporary media folder, which are both removed afterwards
+        with tempfile.TemporaryDirectory() as media_root:
+            shutil.copytree(settings.MEDIA_ROOT/'test_resources', Path(media_root)/'test_resources')
+            # The audio analysis of uploads is only queued, the benchmark measures the request itself
+            with override_settings(MEDIA_ROOT=Path(media_root), JOB_RUNNER='recordingmgmt.jobs.DatabaseRunner'):
+                test_runner = runner.DiscoverRunner(verbosity=0, interactive=False)
+                old_config = test_runner.setup_databases()
+                try:
+                    for scale in kwargs['scale']:
+                        self.stdout.write(f"Running scale '{scale}' ...")
+                        for result in benchmarks.run_scale(scale, benchmarks.SCALES[scale], kwargs['repeat'], kwargs['endpoint']):
+                            self.stdout.write(f"  {result['endpoint']}: {result['queries']} queries, "
+                                              f"{result['time_ms']['median']:.1f} ms, {result['peak_memory_kb']:.0f} KiB")
+                            results.append(result)
+                    if kwargs['ingest']:
+                        self.stdout.write("Running text ingest ...")
+                        for result in benchmarks.run_encoding_detection(kwargs['repeat']):
+                            self.stdout.write(f"  {result['endpoint']}: {result['encoding']} in {result['time_ms']['median']:.2f} ms, "
+                                              f"chardet: {result['chardet_encoding']} in {result['chardet_time_ms']:.2f} ms")
+                            results.append(result)
+                        for result in benchmarks.run_text_parsing(kwargs['repeat']):
+                            self.stdout.write(f"  {result['endpoint']}: {result['time_ms']['median']:.1f} ms, {result['peak_memory_kb']:.0f} KiB")
+                            results.append(result)
+                finally:
+                    test_runner.teardown_databases(old_config)
+
+        report = {
+            'created': datetime.datetime.now().isoformat(),
+            'commit': self.get_commit(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'repeat': kwargs['repeat'],
+            'scales': {scale: benchmarks.SCALES[scale] for scale in kwargs['scale']},
+            'results': results,
+        }
+        if kwargs['output']:
+            with open(kwargs['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {kwargs['output']}")
+
+        if old_report is not None:
+            regressions = 0
+            self.stdout.write(f"Compared to {old_report.get('commit')}:")
+            for scale, endpoint, old, new in benchmarks.compare(old_report['results'], results):
+                ratio = new['time_ms']['median'] / old['time_ms']['median'] if old['time_ms']['median'] else 0
+                self.stdout.write(f"  {scale}/{endpoint}: queries {old['queries']} -> {new['queries']}, "
+                                  f"time x{ratio:.2f}, memory {old['peak_memory_kb']:.0f} -> {new['peak_memory_kb']:.0f} KiB")
+                if new['queries'] > old['queries']:
+                    regressions += 1
+            if regressions > 0:
+                raise CommandError(str(regressions) + " endpoints need more queries than before.")
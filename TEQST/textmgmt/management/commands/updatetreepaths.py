@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from textmgmt import models as t_models
+
+
+class Command(BaseCommand):
+    help = 'Backfills the materialized Folder.tree_path, e.g. for folders created before it existed'
+
+    def handle(self, *args, **kwargs):
+        fixed = 0
+        # Going down level by level guarantees that the parents already have the correct path
+        level = list(t_models.Folder.objects.filter(parent=None))
+        while level:
+            parents = {folder.pk: folder for folder in level}
+            for folder in level:
+                if folder.update_tree_path():
+                    fixed += 1
+            level = list(t_models.Folder.objects.filter(parent__in=level))
+            for folder in level:
+                folder.parent = parents[folder.parent_id]
+        self.stdout.write(str(fixed) + " folder paths were fixed.")
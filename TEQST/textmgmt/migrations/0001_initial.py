@@ -0,0 +1,79 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import textmgmt.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Folder',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('root_id', models.UUIDField(editable=False, null=True)),
+                ('dl_id', models.UUIDField(editable=False, null=True)),
+                ('name', models.CharField(max_length=250)),
+            ],
+            options={
+                'ordering': ['owner', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ListenerPermission',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('accents', textmgmt.models.ListField(max_length=50, separator=',')),
+                ('all_speakers', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecentProject',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_access', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['speaker', 'folder'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Sentence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField()),
+                ('word_count', models.IntegerField()),
+                ('index', models.IntegerField()),
+            ],
+            options={
+                'ordering': ['text', 'index'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Text',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=100)),
+                ('textfile', models.FileField(upload_to=textmgmt.models.upload_path)),
+            ],
+            options={
+                'ordering': ['shared_folder', 'title'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SharedFolder',
+            fields=[
+                ('folder_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='textmgmt.folder')),
+                ('public', models.BooleanField(default=False)),
+                ('stmfile', models.FileField(blank=True, upload_to=textmgmt.models.stm_upload_path)),
+                ('logfile', models.FileField(blank=True, upload_to=textmgmt.models.log_upload_path)),
+            ],
+            bases=('textmgmt.folder',),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('usermgmt', '0001_initial'),
+        ('textmgmt', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='text',
+            name='language',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='usermgmt.language'),
+        ),
+        migrations.AddField(
+            model_name='sentence',
+            name='text',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sentences', to='textmgmt.text'),
+        ),
+        migrations.AddField(
+            model_name='recentproject',
+            name='folder',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='textmgmt.folder'),
+        ),
+        migrations.AddField(
+            model_name='recentproject',
+            name='speaker',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='listenerpermission',
+            name='folder',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lstn_permissions', to='textmgmt.folder'),
+        ),
+        migrations.AddField(
+            model_name='listenerpermission',
+            name='listeners',
+            field=models.ManyToManyField(blank=True, related_name='lstn_permissions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='listenerpermission',
+            name='speakers',
+            field=models.ManyToManyField(blank=True, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='folder', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='subfolder', to='textmgmt.folder'),
+        ),
+        migrations.AddField(
+            model_name='text',
+            name='shared_folder',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='text', to='textmgmt.sharedfolder'),
+        ),
+        migrations.AddField(
+            model_name='sharedfolder',
+            name='listener',
+            field=models.ManyToManyField(blank=True, related_name='listenfolder', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='sharedfolder',
+            name='speaker',
+            field=models.ManyToManyField(blank=True, related_name='sharedfolder', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='sentence',
+            constraint=models.UniqueConstraint(fields=('text', 'index'), name='unique_sentence'),
+        ),
+        migrations.AddConstraint(
+            model_name='recentproject',
+            constraint=models.UniqueConstraint(fields=('speaker', 'folder'), name='unique_project_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='folder',
+            constraint=models.UniqueConstraint(fields=('name', 'parent'), name='unique_subfolder'),
+        ),
+        migrations.AddConstraint(
+            model_name='folder',
+            constraint=models.UniqueConstraint(condition=models.Q(('parent', None)), fields=('name', 'owner'), name='unique_folder'),
+        ),
+        migrations.AddConstraint(
+            model_name='text',
+            constraint=models.UniqueConstraint(fields=('title', 'shared_folder'), name='unique_text'),
+        ),
+    ]
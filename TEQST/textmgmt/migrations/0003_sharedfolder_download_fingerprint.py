@@ -0,0 +1,18 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('textmgmt', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sharedfolder',
+            name='download_fingerprint',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+    ]
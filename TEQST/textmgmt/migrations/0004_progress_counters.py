@@ -0,0 +1,18 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('textmgmt', '0003_sharedfolder_download_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='text',
+            name='sentence_total',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('textmgmt', '0004_progress_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='tree_path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=500),
+        ),
+    ]
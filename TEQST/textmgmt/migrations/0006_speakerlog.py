@@ -0,0 +1,32 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('textmgmt', '0005_folder_tree_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpeakerLog',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('shared_folder', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='speaker_log', to='textmgmt.sharedfolder')),
+                ('speaker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['shared_folder', 'id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='speakerlog',
+            constraint=models.UniqueConstraint(fields=('speaker', 'shared_folder'), name='unique_speaker_log'),
+        ),
+    ]
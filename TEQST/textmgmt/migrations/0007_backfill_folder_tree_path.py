@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def backfill_tree_paths(apps, schema_editor):
+    """
+    Same as the updatetreepaths command, otherwise the listener and root filters skip all existing folders
+    """
+    Folder = apps.get_model('textmgmt', 'Folder')
+    # Going down level by level guarantees that the paths of the parents are already known
+    parent_paths = {None: '/'}
+    level = list(Folder.objects.filter(parent=None).only('id', 'parent_id'))
+    while level:
+        for folder in level:
+            folder.tree_path = f'{parent_paths[folder.parent_id]}{folder.pk}/'
+        Folder.objects.bulk_update(level, ['tree_path'], batch_size=500)
+        parent_paths = {folder.pk: folder.tree_path for folder in level}
+        level = list(Folder.objects.filter(parent__in=list(parent_paths)).only('id', 'parent_id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('textmgmt', '0006_speakerlog'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_tree_paths, migrations.RunPython.noop),
+    ]
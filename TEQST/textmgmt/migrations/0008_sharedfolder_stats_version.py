@@ -0,0 +1,19 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:11
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('textmgmt', '0007_backfill_folder_tree_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sharedfolder',
+            name='stats_version',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:14
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('textmgmt', '0008_sharedfolder_stats_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listenerpermission',
+            name='version',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models, transaction
+from django.apps import apps
+from django.db import connections, models, transaction
+from django.db.models import functions
 from django.core.files import base
 from django.core.files.storage import default_storage
 from django.conf import settings
@@ -6,11 +8,36 @@ from django.contrib import auth
 from django import urls
 from . import utils
 from usermgmt import models as user_models
-import zipfile, chardet, re, uuid
+import hashlib, itertools, re, uuid
 from pathlib import Path
 #from google.cloud.storage import Blob
 
 
+def supports_recursive_cte(connection):
+    if connection.vendor == 'mysql':
+        return connection.mysql_version >= ((10, 2) if connection.mysql_is_mariadb else (8,))
+    return connection.vendor in ['postgresql', 'sqlite']
+
+
+# Fields of the recordings and the speaker log, which are written to the stm and the log of the download
+DOWNLOAD_RECORDING_FIELDS = [
+    'pk', 'SR_permission', 'TTS_permission', 'speaker__username', 'speaker__gender', 'speaker__education',
+    'speaker__country', 'speaker__accent',
+]
+DOWNLOAD_LOG_FIELDS = ['speaker__username', 'speaker__email', 'speaker__date_joined', 'speaker__birth_year']
+
+
+def subtree_filter(tree_paths, prefix=''):
+    """
+    Returns a Q object for the folders at or below the folders with the given tree paths.
+    Folders without tree_path are skipped, see the updatetreepaths command.
+    """
+    q = models.Q(pk__in=[])
+    for tree_path in tree_paths:
+        if tree_path:
+            q |= models.Q(**{f'{prefix}tree_path__startswith': tree_path})
+    return q
+
 
 class Folder(models.Model):
     root_id = models.UUIDField(null=True, editable=False)
@@ -18,6 +45,9 @@ class Folder(models.Model):
     name = models.CharField(max_length=250)
     owner = models.ForeignKey(auth.get_user_model(), on_delete=models.CASCADE, related_name='folder')  
     parent = models.ForeignKey('self', on_delete=models.CASCADE, related_name='subfolder', blank=True, null=True)
+    # Materialized path of the folder ids from the top level folder down to this folder, e.g. '/3/7/12/'
+    # It is maintained in save, subtree and ancestor queries use it instead of walking the parent chain
+    tree_path = models.CharField(max_length=500, blank=True, editable=False, db_index=True)
 
     class Meta:
         ordering = ['owner', 'name']
@@ -55,6 +85,7 @@ class Folder(models.Model):
     
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
+        self.update_tree_path()
         # TODO test, if this is actually not needed, then omit the save method
         # if self.is_shared_folder() and not isinstance(self, SharedFolder):
         #     sf = self.sharedfolder
@@ -65,33 +96,129 @@ class Folder(models.Model):
     def is_owner(self, user):
         return self.owner == user
 
-    #Used for permission checks
-    def is_listener(self, user):
-        if self.lstn_permissions.filter(listeners=user).exists():
-            return True
+    def build_tree_path(self):
         if self.parent is None:
+            return f'/{self.pk}/'
+        parent_path = self.parent.tree_path or self.parent.build_tree_path()
+        return f'{parent_path}{self.pk}/'
+
+    def update_tree_path(self):
+        """
+        Sets tree_path according to the parent and moves the paths of all subfolders along.
+        Returns True if the path was changed.
+        """
+        old_path = self.tree_path
+        new_path = self.build_tree_path()
+        if old_path == new_path:
             return False
-        return self.parent.is_listener(user)
+        Folder.objects.filter(pk=self.pk).update(tree_path=new_path)
+        if old_path:
+            Folder.objects.filter(tree_path__startswith=old_path).exclude(pk=self.pk).update(
+                tree_path=functions.Concat(models.Value(new_path), functions.Substr('tree_path', len(old_path) + 1))
+            )
+        self.tree_path = new_path
+        return True
+
+    def has_tree_path(self):
+        return self.tree_path.endswith(f'/{self.pk}/')
 
+    def get_tree_path_ids(self):
+        return [int(id) for id in self.tree_path.strip('/').split('/')]
+
+    def descendants(self, include_self=True):
+        """
+        Returns a queryset of all folders below this folder, and of the folder itself if include_self is set.
+        """
+        if self.has_tree_path():
+            queryset = Folder.objects.filter(tree_path__startswith=self.tree_path)
+        else:
+            # Fallback for folders without tree_path, with one query per level
+            ids = [self.pk]
+            level = [self.pk]
+            while level:
+                level = list(Folder.objects.filter(parent__in=level).values_list('id', flat=True))
+                ids.extend(level)
+            queryset = Folder.objects.filter(pk__in=ids)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+
+    def ancestors(self, include_self=False):
+        """
+        Returns a queryset of all folders above this folder, and of the folder itself if include_self is set.
+        The tree_path is used if it is available. Otherwise the parent chain is resolved with
+        a single recursive query if the database supports it.
+        """
+        if self.has_tree_path():
+            ids = self.get_tree_path_ids()
+            return Folder.objects.filter(pk__in=ids if include_self else ids[:-1])
+        start_id = self.pk if include_self else self.parent_id
+        if start_id is None:
+            return Folder.objects.none()
+        connection = connections[Folder.objects.db]
+        if supports_recursive_cte(connection):
+            table = connection.ops.quote_name(Folder._meta.db_table)
+            sql = f"""
+                WITH RECURSIVE ancestors(id, parent_id) AS (
+                    SELECT id, parent_id FROM {table} WHERE id = %s
+                    UNION ALL
+                    SELECT f.id, f.parent_id FROM {table} f INNER JOIN ancestors a ON f.id = a.parent_id
+                )
+                SELECT id FROM ancestors
+            """
+            return Folder.objects.filter(pk__in=models.expressions.RawSQL(sql, [start_id]))
+        # Fallback with one query per level
+        ids = []
+        while start_id is not None:
+            ids.append(start_id)
+            start_id = Folder.objects.filter(pk=start_id).values_list('parent_id', flat=True).first()
+        return Folder.objects.filter(pk__in=ids)
+
+    #Used for permission checks
+    def is_listener(self, user):
+        return ListenerPermission.objects.filter(folder__in=self.ancestors(include_self=True), listeners=user).exists()
+
+    # root_id and dl_id are compared directly, the root and download properties would create missing ids
     def is_root(self, root):
-        return self.root == root
+        return self.root_id == root
     
     def is_dl_root(self, download):
-        return self.download == download
+        return self.dl_id == download
 
     def is_below_root(self, root):
-        if self.parent is None:
-            return False
-        if self.parent.is_root(root):
-            return True
-        return self.parent.is_below_root(root)
+        return self.ancestors().filter(root_id=root).exists()
     
     def is_below_dl_root(self, download):
-        if self.parent is None:
-            return False
-        if self.parent.is_dl_root(download):
-            return True
-        return self.parent.is_below_dl_root(download)
+        return self.ancestors().filter(dl_id=download).exists()
+
+    def is_at_or_below_root(self, root):
+        return self.ancestors(include_self=True).filter(root_id=root).exists()
+
+    def is_at_or_below_dl_root(self, download):
+        return self.ancestors(include_self=True).filter(dl_id=download).exists()
+
+    # The filters are the batch versions of the permission checks, see usermgmt/permissions.py.
+    # They return Q objects, prefix is the lookup from the filtered model to the folder.
+
+    @classmethod
+    def owner_filter(cls, user, prefix=''):
+        return models.Q(**{f'{prefix}owner': user})
+
+    @classmethod
+    def listener_filter(cls, user, prefix=''):
+        tree_paths = ListenerPermission.objects.filter(listeners=user).values_list('folder__tree_path', flat=True)
+        return subtree_filter(tree_paths, prefix)
+
+    @classmethod
+    def root_filter(cls, root, prefix=''):
+        return models.Q(**{f'{prefix}root_id': root})
+
+    @classmethod
+    def below_root_filter(cls, root, prefix='', include_root=False):
+        q = subtree_filter(Folder.objects.filter(root_id=root).values_list('tree_path', flat=True), prefix)
+        if not include_root:
+            q &= ~models.Q(**{f'{prefix}root_id': root})
+        return q
 
     def get_parent_name(self):
         if self.parent == None:
@@ -114,13 +241,29 @@ class Folder(models.Model):
     def get_readable_path(self):
         return self.get_path()
 
+    def get_path_names(self):
+        """
+        Returns the names of the folders from the top level folder down to this folder
+        """
+        if not self.has_tree_path():
+            names = []
+            folder = self
+            while folder != None:  # go through the folders
+                names.append(str(folder.name))
+                folder = folder.parent
+            names.reverse()
+            return names
+        ids = self.get_tree_path_ids()[:-1]
+        names = dict(Folder.objects.filter(pk__in=ids).values_list('id', 'name')) if ids else {}
+        return [str(names[id]) for id in ids] + [str(self.name)]
+
     def make_shared_folder(self):
         if self.is_shared_folder():
             return self.sharedfolder
         if self.subfolder.all().exists():
             raise TypeError("This folder can't be a shared folder")
         # create SharedFolder instance
-        sf = SharedFolder(folder_ptr=self, name=self.name, owner=self.owner, parent=self.parent)
+        sf = SharedFolder(folder_ptr=self, name=self.name, owner=self.owner, parent=self.parent, tree_path=self.tree_path)
         sf.save()
         # create actual folders and files:
         #sf_path = Path(sf.get_path())
@@ -145,12 +288,17 @@ class SharedFolder(Folder):
     speaker = models.ManyToManyField(auth.get_user_model(), related_name='sharedfolder', blank=True)
     listener = models.ManyToManyField(auth.get_user_model(), related_name='listenfolder', blank=True)
     public = models.BooleanField(default=False)
+    # No longer written, the stm and the log are generated from the database, see stm.py and SpeakerLog
     stmfile = models.FileField(upload_to=stm_upload_path, blank=True)
     logfile = models.FileField(upload_to=log_upload_path, blank=True)
+    # Fingerprint of the recordings contained in the last completely stored download archive
+    download_fingerprint = models.CharField(max_length=40, blank=True)
+    # Replaced whenever the stats of the shared folder change, the cached stats are stored under it, see stats.py
+    stats_version = models.UUIDField(default=uuid.uuid4, editable=False)
 
     def save(self, *args, **kwargs):
         if self._state.adding:
-            self.stmfile.save('name', base.ContentFile(b''), save=False)
+            # Stays empty, but creates the directory of the shared folder for the download archives
             self.logfile.save('name', base.ContentFile(b''), save=False)
         super().save(*args, **kwargs)
 
@@ -158,9 +306,30 @@ class SharedFolder(Folder):
     def is_speaker(self, user):
         return self.public or self.speaker.filter(id=user.id).exists()
         #return True
+
+    @classmethod
+    def speaker_filter(cls, user, prefix=''):
+        sharedfolders = SharedFolder.speaker.through.objects.filter(customuser=user).values('sharedfolder')
+        return models.Q(**{f'{prefix}public': True}) | models.Q(**{f'{prefix}pk__in': sharedfolders})
     
     def make_shared_folder(self):
         return self
+
+    def unique_text_titles(self, titles):
+        """
+        Returns the titles with a numbered suffix where they are used by another text of the folder or repeated
+        """
+        used = set(self.text.values_list('title', flat=True))
+        unique_titles = []
+        for title in titles:
+            new_title = title
+            count = 2
+            while new_title in used:
+                new_title = f'{title}_{count:02d}'
+                count += 1
+            used.add(new_title)
+            unique_titles.append(new_title)
+        return unique_titles
     
     def get_path(self):
         path = super().get_path()
@@ -176,76 +345,163 @@ class SharedFolder(Folder):
                 return True
         return False
     
-    def create_zip_for_download(self) -> str:
+    def get_download_members(self):
         """
-        create zip file and return the path to the download.zip file
+        Returns (arcname, storage name) of all files which are part of the download.
+        Generated files are given as a function which returns the chunks of their content instead of a storage name.
         """
+        # Imported here, since stm.py depends on the recordingmgmt models, which depend on this module
+        from . import stm
+        # arcname is the name/path which the file will have inside the zip file
+        names = []
+        for text in self.text.all():
+            for trec in text.textrecording.all():
+                if trec.is_finished():
+                    names.append(trec.audiofile.name)
+        members = [(name.replace(self.get_path()+'/', ''), name) for name in names]
+        # The stm and the log are generated while the archive is written
+        return [
+            (self.get_stm_name(), lambda: stm.sharedfolder_stm(self)),
+            (self.get_log_name(), lambda: [self.render_log().encode('utf-8')]),
+        ] + members
+
+    def get_download_fingerprint(self):
+        """
+        The fingerprint changes whenever a recording in this folder is added, changed, deleted, analyzed or assembled,
+        and whenever the data of the stm or the log changes.
+        """
+        TextRecording = apps.get_model('recordingmgmt', 'TextRecording')
+        agg = self.text.aggregate(
+            count=models.Count('textrecording__srecs'),
+            last_updated=models.Max('textrecording__srecs__last_updated'),
+            pending=models.Count('textrecording__srecs', filter=models.Q(textrecording__srecs__valid='PENDING')),
+            assembled_at=models.Max('textrecording__assembled_at'),
+        )
+        recordings = TextRecording.objects.filter(text__shared_folder=self).order_by('pk').values_list(*DOWNLOAD_RECORDING_FIELDS)
+        log = self.speaker_log.order_by('pk').values_list(*DOWNLOAD_LOG_FIELDS)
+        key = f"{agg['count']}|{agg['last_updated']}|{agg['pending']}|{agg['assembled_at']}|{list(recordings)}|{list(log)}"
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def get_download_path(self, fingerprint):
+        return f'{self.get_path()}/download_{fingerprint[:16]}.zip'
+
+    def get_download_tmp_path(self, fingerprint):
+        """
+        Every writer stores the archive under its own name until it is complete, see utils.move_file
+        """
+        return f'{self.get_path()}/download_{fingerprint[:16]}.{uuid.uuid4().hex}.tmp'
 
-        #return "/tmp/download.zip"
-
-        with default_storage.open(self.get_path()+'/download.zip', 'wb') as f:
-            with zipfile.ZipFile(f, 'w') as zf:
-
-                # arcname is the name/path which the file will have inside the zip file
-                with self.stmfile.open('rb') as stm_file:
-                    zf.writestr(self.stmfile.name.replace(self.get_path()+'/', ''), stm_file.read())
-                with self.logfile.open('rb') as log_file:
-                    zf.writestr(self.logfile.name.replace(self.get_path()+'/', ''), log_file.read())
-
-                #for file_to_zip in (path/'AudioData').glob('*'):
-                for text in self.text.all():
-                    for trec in text.textrecording.all():
-                        if trec.is_finished():
-                            with trec.audiofile.open('rb') as arc_file:
-                                zf.writestr(trec.audiofile.name.replace(self.get_path()+'/', ''), arc_file.read())
-
-        return self.get_path()+'/download.zip'
-
-        #return "/tmp/download.zip"
+    def get_cached_zip(self, fingerprint=None):
+        """
+        Returns the path to the stored download archive if it is up to date, None otherwise.
+        The current fingerprint can be passed in if it is already known, see get_download_fingerprint
+        """
+        if fingerprint is None:
+            fingerprint = self.get_download_fingerprint()
+        zip_path = self.get_download_path(fingerprint)
+        if self.download_fingerprint == fingerprint and default_storage.exists(zip_path):
+            return zip_path
+        return None
+
+    def set_cached_zip(self, fingerprint):
+        """
+        Marks the archive for `fingerprint` as completely stored and deletes the outdated one
+        """
+        if self.download_fingerprint and self.download_fingerprint != fingerprint:
+            default_storage.delete(self.get_download_path(self.download_fingerprint))
+        self.download_fingerprint = fingerprint
+        self.save(update_fields=['download_fingerprint'])
 
-    def concat_stms(self):
+    def create_zip_for_download(self, fingerprint=None) -> str:
+        """
+        create zip file and return the path to the download zip file
+        The archive is only rebuilt if a recording changed since it was last created
+        """
+        if fingerprint is None:
+            fingerprint = self.get_download_fingerprint()
+        zip_path = self.get_cached_zip(fingerprint)
+        if zip_path is not None:
+            return zip_path
+
+        zip_path = self.get_download_path(fingerprint)
+        tmp_path = self.get_download_tmp_path(fingerprint)
+        try:
+            with default_storage.open(tmp_path, 'wb') as f:
+                for _ in utils.write_zip(f, self.get_download_members()):
+                    pass
+        except BaseException:
+            default_storage.delete(tmp_path)
+            raise
+        utils.move_file(tmp_path, zip_path)
+        self.set_cached_zip(fingerprint)
+        return zip_path
+
+    def stream_zip_for_download(self, fingerprint=None):
+        """
+        Generator which produces the download zip on the fly.
+        The streamed archive is stored at the same time, so later downloads can use the cached archive.
+        """
+        if fingerprint is None:
+            fingerprint = self.get_download_fingerprint()
         # accessing files from their FileFields in write mode under the use of the GoogleCloudStorage from django-storages
         # causes errors. Opening files in write mode from the storage works.
-        with default_storage.open(self.stmfile.name, 'wb') as full:
-            
-            speakers = set()
-            for text in self.text.all():
-                speakers = speakers.union(text.get_speakers())
-
-            headers = utils.create_headers(speakers)
-
-            full.write(bytes(headers, encoding='utf-8'))
+        tmp_path = self.get_download_tmp_path(fingerprint)
+        try:
+            with default_storage.open(tmp_path, 'wb') as cache:
+                for data in utils.stream_zip(self.get_download_members()):
+                    cache.write(data)
+                    yield data
+        except BaseException:
+            # Includes GeneratorExit if the client aborted the download
+            default_storage.delete(tmp_path)
+            raise
+        # Only reached if the client received the whole archive
+        utils.move_file(tmp_path, self.get_download_path(fingerprint))
+        self.set_cached_zip(fingerprint)
+
+    def get_finished_recordings(self):
+        TextRecording = apps.get_model('recordingmgmt', 'TextRecording')
+        return TextRecording.objects.filter(text__shared_folder=self, srec_count__gte=models.F('text__sentence_total'))
+
+    def get_stm_name(self):
+        return stm_upload_path(self, None).replace(self.get_path()+'/', '')
+
+    def get_log_name(self):
+        return log_upload_path(self, None).replace(self.get_path()+'/', '')
 
-            for text in self.text.all():
-                text.append_stms(full)
-                
     def log_contains_user(self, username):
-        with self.logfile.open('rb') as log:
-            lines = log.readlines()
-            for line in lines:
-                line = line.decode('utf-8')
-                if line[:8] == 'username':
-                    if line[10:] == username + '\n':
-                        return True
-        return False
+        return self.speaker_log.filter(speaker__username=username).exists()
 
     def add_user_to_log(self, user):
-        if self.log_contains_user(str(user.username)):
-            return
-        file_content = b''
-        with self.logfile.open('rb') as log:
-            file_content = log.read()
-        
-        logfile_entry = 'username: ' + str(user.username) + '\n' \
-                        + 'email: ' + str(user.email) + '\n' \
-                        + 'date_joined: ' + str(user.date_joined) + '\n' \
-                        + 'birth_year: ' + str(user.birth_year) + '\n#\n'
-        file_content += bytes(logfile_entry, encoding='utf-8')
-        # accessing files from their FileFields in write mode under the use of the GoogleCloudStorage from django-storages
-        # causes errors. Opening files in write mode from the storage works.
-        with default_storage.open(self.logfile.name, 'wb') as logw:
-            logw.write(file_content)
+        SpeakerLog.objects.get_or_create(shared_folder=self, speaker=user)
+
+    def render_log(self):
+        """
+        Returns the content of log.txt, one entry per speaker in the order they were added
+        """
+        log = ''
+        for entry in self.speaker_log.select_related('speaker'):
+            user = entry.speaker
+            log += 'username: ' + str(user.username) + '\n' \
+                   + 'email: ' + str(user.email) + '\n' \
+                   + 'date_joined: ' + str(user.date_joined) + '\n' \
+                   + 'birth_year: ' + str(user.birth_year) + '\n#\n'
+        return log
+
 
+class SpeakerLog(models.Model):
+    """
+    Entry of the log.txt of a shared folder, which is generated from these
+    """
+    shared_folder = models.ForeignKey(SharedFolder, on_delete=models.CASCADE, related_name='speaker_log')
+    speaker = models.ForeignKey(auth.get_user_model(), on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['shared_folder', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['speaker', 'shared_folder'], name='unique_speaker_log'),
+        ]
 
 
 def upload_path(instance, filename):
@@ -261,7 +517,7 @@ def upload_path(instance, filename):
 def get_encoding_type(file_path):
     with default_storage.open(file_path, 'rb') as f:
         rawdata = f.read()
-    return chardet.detect(rawdata)['encoding']
+    return utils.detect_encoding(rawdata)
 
 
 class Text(models.Model):
@@ -269,6 +525,8 @@ class Text(models.Model):
     language = models.ForeignKey(user_models.Language, on_delete=models.SET_NULL, null=True, blank=True)
     shared_folder = models.ForeignKey(SharedFolder, on_delete=models.CASCADE, related_name='text')
     textfile = models.FileField(upload_to=upload_path)
+    # Materialized number of sentences, set in create_sentences
+    sentence_total = models.IntegerField(default=0)
 
     class Meta:
         ordering = ['shared_folder','title']
@@ -303,10 +561,26 @@ class Text(models.Model):
         return self.shared_folder.is_listener(user)
 
     def is_below_root(self, root):
-        return self.shared_folder.is_below_root(root) or self.shared_folder.is_root(root)
+        return self.shared_folder.is_at_or_below_root(root)
     
     def is_below_dl_root(self, download):
-        return self.shared_folder.is_below_dl_root(download) or self.shared_folder.is_dl_root(download)
+        return self.shared_folder.is_at_or_below_dl_root(download)
+
+    @classmethod
+    def owner_filter(cls, user, prefix=''):
+        return SharedFolder.owner_filter(user, f'{prefix}shared_folder__')
+
+    @classmethod
+    def speaker_filter(cls, user, prefix=''):
+        return SharedFolder.speaker_filter(user, f'{prefix}shared_folder__')
+
+    @classmethod
+    def listener_filter(cls, user, prefix=''):
+        return SharedFolder.listener_filter(user, f'{prefix}shared_folder__')
+
+    @classmethod
+    def below_root_filter(cls, root, prefix=''):
+        return SharedFolder.below_root_filter(root, f'{prefix}shared_folder__', include_root=True)
     
     def save(self, *args, **kwargs):
         #Now expects a proper sharedfolder instance
@@ -336,33 +610,57 @@ class Text(models.Model):
         """
 
     def create_sentences(self):
+        # The file is read before the transaction is started, so it is only held open for the inserts
+        sentences = self.make_sentences(self.read_sentences())
         with transaction.atomic():
             if not self.sentences.exists():
-                with self.textfile.open('rb') as f:
-
-                    # it is not enough to detect the encoding from the first line
-                    # it hast to be the entire file content
-                    encoding = chardet.detect(f.read())['encoding']
-                    f.seek(0)
-                    file_content = f.readlines()
-
-                    sentence = ""
-                    content = []
-                    for l in file_content:
-                        line = l.decode(encoding).strip()
-                        if line == "":
-                            if sentence != "":
-                                content.append(sentence)
-                                sentence = ""
-                        else:
-                            if sentence != "":
-                                sentence += ' '
-                            sentence += line
-                    if sentence != "":
-                        content.append(sentence)
-
-                for i in range(len(content)):
-                    self.sentences.create(content=content[i], index=i + 1, word_count=content[i].strip().count(' ') + 1)
+                Sentence.objects.bulk_create(sentences, batch_size=settings.SENTENCE_BATCH_SIZE)
+                self.sentence_total = len(sentences)
+                super().save(update_fields=['sentence_total'])
+
+    def make_sentences(self, content):
+        return [
+            Sentence(text=self, content=sentence, index=i + 1, word_count=sentence.count(' ') + 1)
+            for i, sentence in enumerate(content)
+        ]
+
+    @classmethod
+    def bulk_create_with_sentences(cls, texts):
+        """
+        Inserts the given (unsaved Text, list of sentences) pairs in batches instead of saving every text on its own.
+        The titles have to be unique within the shared folders of the texts.
+        """
+        for text, content in texts:
+            text.sentence_total = len(content)
+        with transaction.atomic():
+            created = cls.objects.bulk_create([text for text, _ in texts])
+            if any(text.pk is None for text in created):
+                # Not every database returns the primary keys of inserted rows
+                pks = {(sf, title): pk for sf, title, pk in cls.objects.filter(
+                    shared_folder__in={text.shared_folder_id for text in created},
+                    title__in={text.title for text in created},
+                ).values_list('shared_folder', 'title', 'pk')}
+                for text in created:
+                    text.pk = pks[(text.shared_folder_id, text.title)]
+                    text._state.adding = False
+            Sentence.objects.bulk_create(
+                itertools.chain.from_iterable(text.make_sentences(content) for text, content in texts),
+                batch_size=settings.SENTENCE_BATCH_SIZE,
+            )
+        # bulk_create doesn't send post_save, so the stats aren't invalidated by the signals
+        from . import stats
+        for sf_id in {text.shared_folder_id for text in created}:
+            stats.invalidate_stats(sf_id)
+        return created
+
+    def read_sentences(self):
+        with self.textfile.open('rb') as f:
+
+            # it is not enough to detect the encoding from the first line
+            # it hast to be the entire file content
+            encoding = utils.detect_encoding(f.read())
+            f.seek(0)
+            return list(utils.group_sentences(l.decode(encoding) for l in f.readlines()))
 
     def get_content(self):
         content = []
@@ -371,7 +669,18 @@ class Text(models.Model):
         return content
     
     def sentence_count(self):
-        return self.sentences.count()
+        return self.sentence_total
+
+    def update_sentence_total(self):
+        """
+        Recomputes the materialized sentence_total. Returns True if it was wrong.
+        """
+        count = self.sentences.count()
+        if count == self.sentence_total:
+            return False
+        self.sentence_total = count
+        super().save(update_fields=['sentence_total'])
+        return True
 
     def word_count(self, sentence_limit=None):
         if sentence_limit == None:
@@ -392,12 +701,6 @@ class Text(models.Model):
                 speakers.add(trec.speaker)
         return speakers
 
-    def append_stms(self, file):
-        for trec in self.textrecording.all():
-            if trec.is_finished():
-                with trec.stmfile.open('rb') as part:
-                    file.write(part.read())
-
 
 class Sentence(models.Model):
     text = models.ForeignKey(Text, on_delete=models.CASCADE, related_name='sentences', null=False, blank=False)
@@ -462,6 +765,15 @@ class ListenerPermission(models.Model):
     speakers = models.ManyToManyField(auth.get_user_model(), blank=True)
     accents = ListField(separator=',', max_length=50)
     all_speakers = models.BooleanField(default=False)
+    # Replaced on every save and whenever the speakers change, the visible speakers are cached under it,
+    # see permissions.get_visible_speakers. A random version can't return to an earlier value after a stale save.
+    version = models.UUIDField(default=uuid.uuid4, editable=False)
+
+    def save(self, *args, **kwargs):
+        self.version = uuid.uuid4()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = [*kwargs['update_fields'], 'version']
+        super().save(*args, **kwargs)
 
     @property
     def user_list(self):
@@ -478,6 +790,10 @@ class ListenerPermission(models.Model):
     def is_owner(self, user):
         return self.folder.is_owner(user)
 
+    @classmethod
+    def owner_filter(cls, user, prefix=''):
+        return Folder.owner_filter(user, f'{prefix}folder__')
+
 
 
 class RecentProject(models.Model):
@@ -1,6 +1,10 @@
 from rest_framework import permissions, serializers
+from django.conf import settings
+from django.core.cache import cache
 from . import models
 from usermgmt import models as user_models
+from usermgmt.permissions import NOTHING
+import hashlib
 
 
 
@@ -22,6 +26,12 @@ class BelowRoot(permissions.BasePermission):
             return False
         return obj.is_below_root(root=ser.validated_data['root'])
 
+    def get_object_filter(self, request, view, model):
+        ser = RootParamSerializer(data=request.query_params)
+        if not ser.is_valid(raise_exception=False):
+            return NOTHING
+        return model.below_root_filter(ser.validated_data['root'])
+
 
 class IsRoot(permissions.BasePermission):
 
@@ -40,15 +50,80 @@ class IsRoot(permissions.BasePermission):
             return False
         return obj.is_root(root=ser.validated_data['root'])
 
+    def get_object_filter(self, request, view, model):
+        ser = RootParamSerializer(data=request.query_params)
+        if not ser.is_valid(raise_exception=False):
+            return NOTHING
+        return model.root_filter(ser.validated_data['root'])
+
 
 def get_listener_permissions(folder, listener):
-    perm_list = []
-    while not folder is None:
-        perm_list.append( folder.lstn_permissions.filter(listeners=listener).order_by() )
-        folder = folder.parent
-    return models.ListenerPermission.objects.none().order_by().union(*perm_list)
+    return models.ListenerPermission.objects.filter(folder__in=folder.ancestors(include_self=True), listeners=listener).order_by()
+
+
+class SpeakerSet:
+    """
+    The speakers whose recordings a listener may access, either all speakers or a set of speaker ids
+    """
+
+    def __init__(self, speaker_ids=(), all_speakers=False):
+        self.speaker_ids = frozenset(speaker_ids)
+        self.all_speakers = all_speakers
+
+    def __contains__(self, speaker_id):
+        return self.all_speakers or speaker_id in self.speaker_ids
+
+    def filter(self, queryset):
+        """
+        Restricts a queryset of users to the speakers in this set
+        """
+        if self.all_speakers:
+            return queryset
+        return queryset.filter(pk__in=self.speaker_ids)
+
+
+def combine_permissions(listener_permissions):
+    """
+    Returns a SpeakerSet of the speakers which the permissions list explicitly and the accents of the permissions.
+    The speakers of the permissions should be prefetched.
+    """
+    speaker_ids = set()
+    accents = set()
+    for perm in listener_permissions:
+        if perm.all_speakers:
+            return SpeakerSet(all_speakers=True), frozenset()
+        speaker_ids.update(speaker.pk for speaker in perm.speakers.all())
+        accents.update(perm.accents)
+    return SpeakerSet(speaker_ids), frozenset(accents)
+
+
+def add_accent_speakers(speakers, accents):
+    if not accents:
+        return speakers
+    accent_ids = user_models.CustomUser.objects.filter(accent__in=accents).values_list('pk', flat=True)
+    return SpeakerSet(speakers.speaker_ids.union(accent_ids))
+
 
+def get_visible_speakers(folder, listener):
+    """
+    Returns the SpeakerSet of the listener for the folder.
+    The speakers of the listener permissions above the folder are cached under the ids and versions of these permissions,
+    which are read from the database every time. Revoked or changed permissions therefore take effect in all processes
+    at once, see ListenerPermission.version. Speakers with the accents of the permissions are not cached.
+    """
+    versions = list(get_listener_permissions(folder, listener).order_by('pk').values_list('pk', 'version'))
+    if not versions:
+        return SpeakerSet()
+    # The key identifies the permissions by their ids and versions, it is hashed to limit its length
+    permission_key = ','.join(f'{pk}:{version.hex}' for pk, version in versions)
+    key = f"listener_visibility:{hashlib.sha1(permission_key.encode('utf-8')).hexdigest()}"
 
-def get_combined_speakers(listener_permissions):
-    user_list_list = [ perm.user_list.order_by() for perm in listener_permissions ]
-    return user_models.CustomUser.objects.none().order_by().union(*user_list_list)
+    entry = cache.get(key)
+    if entry is None:
+        perms = models.ListenerPermission.objects.filter(pk__in=[pk for pk, _ in versions]).order_by('pk')
+        perms = list(perms.prefetch_related('speakers'))
+        entry = combine_permissions(perms)
+        # A permission which changed in the meantime has a new version, the set must not be cached under the old one
+        if [(perm.pk, perm.version) for perm in perms] == versions:
+            cache.set(key, entry, settings.LISTENER_VISIBILITY_CACHE_TIMEOUT)
+    return add_accent_speakers(*entry)
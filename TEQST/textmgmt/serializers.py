@@ -1,10 +1,12 @@
 from rest_framework import serializers
 from . import models, utils, stats
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
 from django import urls
 from usermgmt import models as user_models, serializers as user_serializers
 from recordingmgmt import models as rec_models
 import django.core.files.uploadedfile as uploadedfile
-import chardet, math, uuid
+import math, uuid
 
 
 class FolderPKField(serializers.PrimaryKeyRelatedField):
@@ -141,7 +143,7 @@ class TextFullSerializer(serializers.ModelSerializer):
         textfiles = []
         # get encoding
         textfile.open(mode='rb')
-        encoding = chardet.detect(textfile.read())['encoding']
+        encoding = utils.detect_encoding(textfile.read())
 
         # put all sentences in a list
         filecontent = []  # list of all sentences in the textfile
@@ -216,7 +218,7 @@ class TextProgressSerializer(serializers.ModelSerializer):
     through serializer: SharedFolderTextSerializer
     for: retrieval of texts of a sharedfolder including information on progress of request.user
     """
-    words_total = serializers.IntegerField(read_only=True, source='word_count')
+    words_total = serializers.SerializerMethodField()
     words_finished = serializers.SerializerMethodField()
 
     class Meta:
@@ -224,7 +226,16 @@ class TextProgressSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'words_total', 'words_finished']
         read_only_fields = fields
 
+    # SpkTextListView annotates the word counts, the queries are the fallback for other querysets
+
+    def get_words_total(self, obj: models.Text):
+        if hasattr(obj, 'words_total'):
+            return obj.words_total
+        return obj.word_count()
+
     def get_words_finished(self, obj: models.Text):
+        if hasattr(obj, 'words_finished'):
+            return obj.words_finished
         text = obj
         user = self.context['request'].user
         sentences_finished = 0
@@ -248,7 +259,7 @@ class TextStatsSerializer(serializers.ModelSerializer):
         read_only_fields = fields
     
     def get_speaker_stats(self, obj):
-        return stats.text_stats(obj)
+        return stats.cached_text_stats(obj)
 
 
 class SpkSharedFolderTextSerializer(serializers.ModelSerializer):
@@ -268,12 +279,10 @@ class SpkSharedFolderTextSerializer(serializers.ModelSerializer):
     def get_timestats(self, obj):
         user = self.context['request'].user
         sharedfolder = obj
-        timestats = {'rec_time_without_rep': 0, 'rec_time_with_rep': 0}
-        for text in sharedfolder.text.all():
-            if rec_models.TextRecording.objects.filter(text=text, speaker=user).exists():
-                textrecording = rec_models.TextRecording.objects.get(text=text, speaker=user)
-                timestats['rec_time_without_rep'] += textrecording.rec_time_without_rep
-                timestats['rec_time_with_rep'] += textrecording.rec_time_with_rep
+        timestats = rec_models.TextRecording.objects.filter(text__shared_folder=sharedfolder, speaker=user).with_times().aggregate(
+            rec_time_without_rep=Coalesce(Sum('annotated_rec_time_without_rep'), 0.0),
+            rec_time_with_rep=Coalesce(Sum('annotated_rec_time_with_rep'), 0.0),
+        )
         return timestats
 
 
@@ -320,7 +329,7 @@ class SharedFolderStatsSerializer(serializers.ModelSerializer):
         read_only_fields = fields
     
     def get_speaker_stats(self, obj):
-        return stats.sharedfolder_stats(obj)
+        return stats.cached_sharedfolder_stats(obj)
 
 
 class SpkPublisherSerializer(serializers.ModelSerializer):
@@ -0,0 +1,89 @@
+from django.db import models
+from django.dispatch import receiver
+from recordingmgmt import models as rec_models
+from . import models as text_models, stats
+import uuid
+
+
+# Every change which can show up in the publisher and listener stats invalidates the cached stats of the shared folder.
+# Cascading deletes also send these signals.
+
+@receiver(models.signals.post_save, sender=text_models.SharedFolder)
+@receiver(models.signals.post_delete, sender=text_models.SharedFolder)
+def invalidate_sharedfolder_stats(sender, instance, **kwargs):
+    stats.invalidate_stats(instance.pk)
+
+
+@receiver(models.signals.post_save, sender=text_models.Text)
+@receiver(models.signals.post_delete, sender=text_models.Text)
+def invalidate_text_stats(sender, instance, **kwargs):
+    stats.invalidate_stats(instance.shared_folder_id)
+
+
+@receiver(models.signals.post_save, sender=rec_models.TextRecording)
+@receiver(models.signals.post_delete, sender=rec_models.TextRecording)
+def invalidate_textrecording_stats(sender, instance, **kwargs):
+    sf_id = text_models.Text.objects.filter(pk=instance.text_id).values_list('shared_folder', flat=True).first()
+    if sf_id is not None:
+        stats.invalidate_stats(sf_id)
+
+
+@receiver(models.signals.post_save, sender=rec_models.SentenceRecording)
+@receiver(models.signals.post_delete, sender=rec_models.SentenceRecording)
+def invalidate_sentencerecording_stats(sender, instance, **kwargs):
+    sf_id = rec_models.TextRecording.objects.filter(pk=instance.recording_id) \
+        .values_list('text__shared_folder', flat=True).first()
+    if sf_id is not None:
+        stats.invalidate_stats(sf_id)
+
+
+@receiver(models.signals.post_save, sender=rec_models.SentenceRecordingBackup)
+@receiver(models.signals.post_delete, sender=rec_models.SentenceRecordingBackup)
+def invalidate_backup_stats(sender, instance, **kwargs):
+    sf_id = rec_models.SentenceRecording.objects.filter(pk=instance.recording_id) \
+        .values_list('recording__text__shared_folder', flat=True).first()
+    if sf_id is not None:
+        stats.invalidate_stats(sf_id)
+
+
+@receiver(models.signals.m2m_changed, sender=text_models.SharedFolder.speaker.through)
+def invalidate_speaker_stats(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ['post_add', 'post_remove', 'post_clear', 'pre_clear']:
+        return
+    if not reverse:
+        stats.invalidate_stats(instance.pk)
+    elif action == 'pre_clear':
+        # The shared folders of the user are unknown after the clear
+        for sf_id in instance.sharedfolder.values_list('pk', flat=True):
+            stats.invalidate_stats(sf_id)
+    elif pk_set:
+        for sf_id in pk_set:
+            stats.invalidate_stats(sf_id)
+
+
+@receiver(models.signals.post_delete, sender=text_models.SharedFolder.speaker.through)
+def invalidate_removed_speaker_stats(sender, instance, **kwargs):
+    # Sent when a speaker is deleted, which doesn't send m2m_changed
+    stats.invalidate_stats(instance.sharedfolder_id)
+
+
+# The speakers which are visible to listeners are cached under the versions of the listener permissions above a folder,
+# see permissions.get_visible_speakers. Saves replace the version in ListenerPermission.save. Which permissions apply
+# is read from the database every time and accents aren't cached, so only changes of the speakers are left here.
+# Ids of deleted users are left in the cached sets, they don't match any recording.
+
+@receiver(models.signals.m2m_changed, sender=text_models.ListenerPermission.speakers.through)
+def invalidate_listener_visibility_speakers(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ['post_add', 'post_remove', 'post_clear', 'pre_clear']:
+        return
+    if not reverse:
+        perm_ids = [instance.pk]
+    elif action == 'pre_clear':
+        # The permissions of the user are unknown after the clear
+        perm_ids = sender.objects.filter(customuser=instance).values('listenerpermission')
+    elif action == 'post_clear' or not pk_set:
+        return
+    else:
+        perm_ids = pk_set
+    # Sent in the same transaction as the change, so no process sees the new speakers under the old version
+    text_models.ListenerPermission.objects.filter(pk__in=perm_ids).update(version=uuid.uuid4())
@@ -1,4 +1,27 @@
+from django.conf import settings
+from django.core.cache import cache
 from usermgmt import models as user_models
+from recordingmgmt import models as rec_models
+from . import models as text_models, permissions as text_permissions
+import hashlib, uuid
+
+
+def textrecording_stats(trecs):
+    """
+    Returns a dict which maps (speaker_id, text_id) to the stats of each TextRecording in the given queryset.
+    Uses a single query with the annotations of TextRecordingQuerySet.with_times instead of several queries per TextRecording.
+    The values are the same as TextRecording.active_sentence, rec_time_without_rep and rec_time_with_rep.
+    """
+    result = {}
+    fields = ['id', 'speaker_id', 'text_id', 'srec_count', 'annotated_rec_time_without_rep', 'annotated_rec_time_with_rep']
+    for trec_id, speaker_id, text_id, srec_count, rec_time_without_rep, rec_time_with_rep in trecs.with_times().order_by().values_list(*fields):
+        result[(speaker_id, text_id)] = {
+            'id': trec_id,
+            'finished': srec_count,
+            'rec_time_without_rep': rec_time_without_rep,
+            'rec_time_with_rep': rec_time_with_rep,
+        }
+    return result
 
 
 def sharedfolder_stats(sf, user_filter=None):
@@ -28,9 +51,8 @@ def sharedfolder_stats(sf, user_filter=None):
     """
     stats = []
 
-    texts = []
-    for t in sf.text.all():
-        texts.append((t, t.title, t.sentence_count()))
+    texts = list(sf.text.values_list('id', 'title', 'sentence_total'))
+    trec_stats = textrecording_stats(rec_models.TextRecording.objects.filter(text__shared_folder=sf))
 
     if user_filter is None:
         user_filter = user_models.CustomUser.objects.all()
@@ -43,15 +65,15 @@ def sharedfolder_stats(sf, user_filter=None):
     for speaker in q1.union(q2).intersection(user_filter).order_by('username'):
         spk = {'name': speaker.username, 'rec_time_without_rep': 0, 'rec_time_with_rep': 0, 'texts': []}
         #for text in models.Text.objects.filter(shared_folder=sf.folder_ptr):
-        for text, title, sentence_count in texts:
+        for text_id, title, sentence_count in texts:
             txt = {'title': title, 'finished': 0, 'total': sentence_count}
-            if text.textrecording.filter(speaker=speaker).exists():
-                textrecording = text.textrecording.get(speaker=speaker)
-                txt['finished'] = textrecording.active_sentence() - 1
-                txt['rec_time_without_rep'] = textrecording.rec_time_without_rep
-                txt['rec_time_with_rep'] = textrecording.rec_time_with_rep
-                spk['rec_time_without_rep'] += textrecording.rec_time_without_rep
-                spk['rec_time_with_rep'] += textrecording.rec_time_with_rep
+            if (speaker.id, text_id) in trec_stats:
+                textrecording = trec_stats[(speaker.id, text_id)]
+                txt['finished'] = textrecording['finished']
+                txt['rec_time_without_rep'] = textrecording['rec_time_without_rep']
+                txt['rec_time_with_rep'] = textrecording['rec_time_with_rep']
+                spk['rec_time_without_rep'] += textrecording['rec_time_without_rep']
+                spk['rec_time_with_rep'] += textrecording['rec_time_with_rep']
             spk['texts'].append(txt)
         stats.append(spk)
     return stats
@@ -71,6 +93,7 @@ def text_stats(text, user_filter=None):
     ]
     """
     stats = []
+    trec_stats = textrecording_stats(text.textrecording.all())
 
     if user_filter is None:
         user_filter = user_models.CustomUser.objects.all()
@@ -82,11 +105,64 @@ def text_stats(text, user_filter=None):
     #the union queryset has to be explicitly reordered
     for speaker in q1.union(q2).intersection(user_filter).order_by('username'):
         spk = {'name': speaker.username, 'finished': 0}
-        if text.textrecording.filter(speaker=speaker).exists():
-            textrecording = text.textrecording.get(speaker=speaker)
-            spk['textrecording_id'] = textrecording.pk
-            spk['finished'] = textrecording.active_sentence() - 1
-            spk['rec_time_without_rep'] = textrecording.rec_time_without_rep
-            spk['rec_time_with_rep'] = textrecording.rec_time_with_rep
+        if (speaker.id, text.id) in trec_stats:
+            textrecording = trec_stats[(speaker.id, text.id)]
+            spk['textrecording_id'] = textrecording['id']
+            spk['finished'] = textrecording['finished']
+            spk['rec_time_without_rep'] = textrecording['rec_time_without_rep']
+            spk['rec_time_with_rep'] = textrecording['rec_time_with_rep']
         stats.append(spk)
-    return stats
\ No newline at end of file
+    return stats
+
+
+# The stats of a shared folder and its texts are cached under the stats_version of the shared folder,
+# which is replaced by the signals in signals.py whenever a recording, text or speaker of the folder changes.
+# The version is stored in the database, so changes in other processes, e.g. in the job runner,
+# also invalidate the stats which are cached in the local memory of this process.
+
+def get_stats_version(sf_id):
+    return text_models.SharedFolder.objects.filter(pk=sf_id).values_list('stats_version', flat=True).first()
+
+
+def invalidate_stats(sf_id):
+    text_models.SharedFolder.objects.filter(pk=sf_id).update(stats_version=uuid.uuid4())
+
+
+def get_filter_key(user_filter):
+    """
+    Identifies the speakers a listener may see, so listeners with the same speakers share the cached stats.
+    user_filter is a queryset of users or a SpeakerSet, which is identified without a query.
+    """
+    if user_filter is None:
+        return 'all'
+    if isinstance(user_filter, text_permissions.SpeakerSet):
+        if user_filter.all_speakers:
+            return 'all'
+        pks = sorted(user_filter.speaker_ids)
+    else:
+        pks = user_filter.order_by('pk').values_list('pk', flat=True)
+    return hashlib.sha1(','.join(map(str, pks)).encode('utf-8')).hexdigest()
+
+
+def get_user_filter(user_filter):
+    if isinstance(user_filter, text_permissions.SpeakerSet):
+        return user_filter.filter(user_models.CustomUser.objects.all())
+    return user_filter
+
+
+def cached_sharedfolder_stats(sf, user_filter=None):
+    """
+    Same as sharedfolder_stats, but the result is only computed again after the shared folder changed.
+    user_filter can also be a SpeakerSet.
+    """
+    key = f'stats:sharedfolder:{sf.pk}:{get_stats_version(sf.pk)}:{get_filter_key(user_filter)}'
+    return cache.get_or_set(key, lambda: sharedfolder_stats(sf, get_user_filter(user_filter)), settings.STATS_CACHE_TIMEOUT)
+
+
+def cached_text_stats(text, user_filter=None):
+    """
+    Same as text_stats, but the result is only computed again after the shared folder of the text changed.
+    user_filter can also be a SpeakerSet.
+    """
+    key = f'stats:text:{text.pk}:{get_stats_version(text.shared_folder_id)}:{get_filter_key(user_filter)}'
+    return cache.get_or_set(key, lambda: text_stats(text, get_user_filter(user_filter)), settings.STATS_CACHE_TIMEOUT)
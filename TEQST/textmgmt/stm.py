@@ -0,0 +1,93 @@
+"""
+Generation of stm files from the database.
+
+The stm of a shared folder consists of the headers for the speakers of all finished TextRecordings and one entry
+per SentenceRecording of these recordings. Start and end times are computed from the frame index of the assembled
+audiofiles (see recordingmgmt/assembly.py). Recordings which were assembled before the index existed fall back
+to the analyzed lengths of their SentenceRecordings.
+"""
+from usermgmt import models as user_models
+from recordingmgmt import models as rec_models
+from recordingmgmt.utils import format_timestamp
+from . import utils
+from pathlib import PurePath
+
+
+# Number of characters which are collected before they are yielded
+CHUNK_SIZE = 64 * 1024
+# Number of rows fetched from the database at once
+QUERY_CHUNK_SIZE = 2000
+# Channels of recordings without a known format, the frontend records mono audio
+DEFAULT_NCHANNELS = 1
+
+ENTRY_FIELDS = [
+    'recording_id', 'recording__audiofile', 'recording__framerate', 'recording__nchannels',
+    'recording__SR_permission', 'recording__TTS_permission',
+    'recording__speaker__username', 'recording__speaker__gender', 'recording__speaker__education',
+    'recording__speaker__country', 'recording__speaker__accent',
+    'frame_offset', 'frame_count', 'length', 'sentence__content',
+]
+
+
+def user_string(gender, education, sr_permission, tts_permission, country, accent):
+    """
+    Encodes the userdata of an entry
+    """
+    user_str = f'<{gender},{education},'
+    if sr_permission:
+        user_str += 'SR'
+    if tts_permission:
+        user_str += 'TTS'
+    user_str += f',{country},{accent}>'
+    return user_str
+
+
+def format_entry(wav_name, nchannels, username, start, end, user_str, content):
+    return wav_name + '_' + username + '_' + format_timestamp(start) + '_' + format_timestamp(end) + ' ' \
+        + wav_name + ' ' + str(nchannels) + ' ' + username + ' ' + "{0:.2f}".format(start) + ' ' + "{0:.2f}".format(end) + ' ' \
+        + user_str + ' ' + content + '\n'
+
+
+def entries(srecs):
+    """
+    Yields the stm entries of the SentenceRecordings, which have to be ordered by recording and sentence.
+    The queryset is evaluated with a single query.
+    """
+    recording = None
+    elapsed = 0.0
+    for (recording_id, audiofile, framerate, nchannels, sr_permission, tts_permission, username, gender, education,
+         country, accent, frame_offset, frame_count, length, content) in srecs.values_list(*ENTRY_FIELDS).iterator(QUERY_CHUNK_SIZE):
+        if recording_id != recording:
+            recording = recording_id
+            elapsed = 0.0
+        if framerate and frame_offset is not None and frame_count is not None:
+            start = frame_offset / framerate
+            end = (frame_offset + frame_count) / framerate
+        else:
+            start = elapsed
+            end = elapsed + length
+        elapsed = end
+        user_str = user_string(gender, education, sr_permission, tts_permission, country, accent)
+        yield format_entry(PurePath(audiofile).stem, nchannels or DEFAULT_NCHANNELS, username, start, end, user_str, content)
+
+
+def sharedfolder_stm(sharedfolder):
+    """
+    Generates the stm of the shared folder as chunks of bytes
+    """
+    finished = sharedfolder.get_finished_recordings()
+    speakers = user_models.CustomUser.objects.filter(pk__in=finished.values('speaker'))
+    # Same order as the texts and the recordings of each text
+    srecs = rec_models.SentenceRecording.objects.filter(recording__in=finished) \
+        .order_by('recording__text__title', 'recording__speaker__username', 'sentence__index')
+
+    buffer = [utils.create_headers(speakers)]
+    size = 0
+    for entry in entries(srecs):
+        buffer.append(entry)
+        size += len(entry)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    yield ''.join(buffer).encode('utf-8')
@@ -0,0 +1,27 @@
+from django.test import TestCase, override_settings
+from django.conf import settings
+from textmgmt import benchmarks
+
+import shutil
+
+
+# The DatabaseRunner only queues the audio analysis of the uploads
+@override_settings(JOB_RUNNER='recordingmgmt.jobs.DatabaseRunner')
+class TestBenchmarks(TestCase):
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT/'bench_tiny_pub', ignore_errors=True)
+
+    def test_run_scale(self):
+        results = benchmarks.run_scale('tiny', benchmarks.SCALES['tiny'], repeat=2)
+        self.assertEqual([r['endpoint'] for r in results], list(benchmarks.ENDPOINTS.keys()))
+        for result in results:
+            self.assertIn(result['status'], [200, 201], result['endpoint'])
+            self.assertGreater(result['queries'], 0)
+            self.assertGreater(result['peak_memory_kb'], 0)
+            self.assertLessEqual(result['time_ms']['min'], result['time_ms']['median'])
+
+    def test_compare(self):
+        old = [{'scale': 'tiny', 'endpoint': 'a', 'queries': 3}, {'scale': 'tiny', 'endpoint': 'b', 'queries': 1}]
+        new = [{'scale': 'tiny', 'endpoint': 'a', 'queries': 4}, {'scale': 'small', 'endpoint': 'a', 'queries': 1}]
+        self.assertEqual(benchmarks.compare(old, new), [('tiny', 'a', old[0], new[0])])
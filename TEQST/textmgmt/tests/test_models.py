@@ -1,9 +1,21 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.conf import settings
-from textmgmt.models import Text, Folder
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.utils import timezone
+from textmgmt.models import Text, Folder, SharedFolder, ListenerPermission, SpeakerLog
+from textmgmt import permissions, utils
 from usermgmt.models import CustomUser
+from usermgmt import permissions as user_permissions
+from rest_framework import permissions as rf_permissions
 from usermgmt.tests.utils import *
-import shutil
+from recordingmgmt.models import TextRecording, SentenceRecording
+from django.apps import apps
+from unittest import mock
+import datetime, importlib, io, itertools, shutil, types, uuid, zipfile
 
 class TestText(TestCase):
 
@@ -60,4 +72,422 @@ class TestText(TestCase):
         filepath = 'test_resources/various_lines_various_nls.txt'
         text = Text.objects.create(title='t1', shared_folder=self.folder, textfile=filepath)
         # test
-        self.assertEqual(text.sentence_count(), 5)
\ No newline at end of file
+        self.assertEqual(text.sentence_count(), 5)
+
+    @override_settings(SENTENCE_BATCH_SIZE=3)
+    def test_create_sentences_in_batches(self):
+        # setup
+        filepath = 'test_resources/all_single_lines_1_newline.txt'
+        with CaptureQueriesContext(connection) as ctx:
+            text = Text.objects.create(title='t1', shared_folder=self.folder, textfile=filepath)
+        # test
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "textmgmt_sentence"')]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(list(text.sentences.values_list('index', 'word_count')), [(1, 6), (2, 12), (3, 5), (4, 6)])
+        self.assertEqual(text.get_content()[3], 'and one newline at the end')
+
+class TestFolderAncestry(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_languages_users_groups()
+
+    def setUp(self):
+        self.user1 = get_user(1)
+        self.user2 = get_user(2)
+        self.f1 = Folder.objects.create(name='f1', owner=self.user1)
+        self.f2 = Folder.objects.create(name='f2', owner=self.user1, parent=self.f1)
+        self.f3 = Folder.objects.create(name='f3', owner=self.user1, parent=self.f2).make_shared_folder()
+
+    def tearDown(self):
+        delete_all_users()
+
+    def test_ancestors(self):
+        self.assertEqual(set(self.f3.ancestors()), {self.f1, self.f2})
+        self.assertEqual(set(self.f3.ancestors(include_self=True)), {self.f1, self.f2, self.f3.folder_ptr})
+        self.assertFalse(self.f1.ancestors().exists())
+
+    def test_ancestors_without_tree_path(self):
+        Folder.objects.update(tree_path='')
+        f3 = Folder.objects.get(pk=self.f3.pk)
+        self.assertEqual(set(f3.ancestors()), {self.f1, self.f2})
+        with mock.patch('textmgmt.models.supports_recursive_cte', return_value=False):
+            self.assertEqual(set(f3.ancestors()), {self.f1, self.f2})
+            self.assertEqual(set(f3.ancestors(include_self=True)), {self.f1, self.f2, f3})
+        self.assertEqual(set(Folder.objects.get(pk=self.f1.pk).descendants()), {self.f1, self.f2, f3})
+
+    def test_tree_path(self):
+        self.assertEqual(Folder.objects.get(pk=self.f3.pk).tree_path, f'/{self.f1.pk}/{self.f2.pk}/{self.f3.pk}/')
+        self.assertEqual(set(self.f1.descendants()), {self.f1, self.f2, self.f3.folder_ptr})
+        self.assertEqual(set(self.f2.descendants(include_self=False)), {self.f3.folder_ptr})
+
+    def test_move_updates_subtree(self):
+        f4 = Folder.objects.create(name='f4', owner=self.user1)
+        self.f2.parent = f4
+        self.f2.save()
+        self.assertEqual(Folder.objects.get(pk=self.f3.pk).tree_path, f'/{f4.pk}/{self.f2.pk}/{self.f3.pk}/')
+        self.assertEqual(set(self.f1.descendants()), {self.f1})
+
+    def test_get_path(self):
+        f3 = Folder.objects.select_related('owner').get(pk=self.f3.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(f3.get_path(), f'{self.user1.username}/f1/f2/f3')
+
+    def test_updatetreepaths(self):
+        Folder.objects.update(tree_path='')
+        call_command('updatetreepaths', stdout=io.StringIO())
+        self.assertEqual(Folder.objects.get(pk=self.f3.pk).tree_path, f'/{self.f1.pk}/{self.f2.pk}/{self.f3.pk}/')
+
+    def test_backfill_migration(self):
+        Folder.objects.update(tree_path='')
+        migration = importlib.import_module('textmgmt.migrations.0007_backfill_folder_tree_path')
+        migration.backfill_tree_paths(apps, None)
+        self.assertEqual(Folder.objects.get(pk=self.f1.pk).tree_path, f'/{self.f1.pk}/')
+        self.assertEqual(Folder.objects.get(pk=self.f3.pk).tree_path, f'/{self.f1.pk}/{self.f2.pk}/{self.f3.pk}/')
+
+    def test_below_root(self):
+        root = self.f1.root
+        self.assertTrue(self.f3.is_below_root(root))
+        self.assertFalse(self.f1.is_below_root(root))
+        self.assertFalse(self.f3.is_below_dl_root(root))
+        # Checking the root must not create ids for the other folders
+        self.assertIsNone(Folder.objects.get(pk=self.f2.pk).root_id)
+
+    def test_listener(self):
+        perm = ListenerPermission.objects.create(folder=self.f1, all_speakers=True)
+        perm.listeners.add(self.user2)
+        with self.assertNumQueries(1):
+            self.assertTrue(self.f3.is_listener(self.user2))
+        self.assertFalse(self.f3.is_listener(self.user1))
+        self.assertEqual(list(permissions.get_listener_permissions(self.f3, self.user2)), [perm])
+
+
+class TestListenerVisibility(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_languages_users_groups()
+
+    def setUp(self):
+        self.user1, self.user2, self.user3, self.user4 = [get_user(i) for i in range(1, 5)]
+        self.f1 = Folder.objects.create(name='f1', owner=self.user1)
+        self.f2 = Folder.objects.create(name='f2', owner=self.user1, parent=self.f1).make_shared_folder()
+        self.text = Text.objects.create(title='t1', shared_folder=self.f2, textfile='test_resources/testtext.txt')
+        self.trec3 = TextRecording.objects.create(speaker=self.user3, text=self.text)
+        self.trec4 = TextRecording.objects.create(speaker=self.user4, text=self.text)
+        self.perm = ListenerPermission.objects.create(folder=self.f1, accents=[self.user3.accent])
+        self.perm.listeners.add(self.user2)
+
+    def tearDown(self):
+        delete_all_users()
+
+    def visible(self, folder, listener):
+        return set(permissions.get_visible_speakers(folder, listener).filter(CustomUser.objects.all()).values_list('pk', flat=True))
+
+    def test_matches_user_list(self):
+        self.perm.speakers.add(self.user1)
+        perm = ListenerPermission.objects.create(folder=self.f2, accents=[])
+        perm.listeners.add(self.user2)
+        perm.speakers.add(self.user4)
+        expected = {user.pk for perm in permissions.get_listener_permissions(self.f2, self.user2) for user in perm.user_list}
+        self.assertEqual(self.visible(self.f2, self.user2), expected)
+        self.assertEqual(expected, {self.user1.pk, self.user3.pk, self.user4.pk})
+        self.assertEqual(self.visible(self.f1, self.user2), {self.user1.pk, self.user3.pk})
+        self.assertEqual(self.visible(self.f2, self.user1), set())
+
+    def test_textrecording_is_listener(self):
+        self.assertTrue(self.trec3.is_listener(self.user2))
+        # The versions of the permissions and the speakers with their accents are read every time
+        with self.assertNumQueries(2):
+            self.assertTrue(self.trec3.is_listener(self.user2))
+        self.assertFalse(self.trec4.is_listener(self.user2))
+        self.assertFalse(self.trec3.is_listener(self.user1))
+
+    def test_changes_invalidate(self):
+        self.assertFalse(self.trec4.is_listener(self.user2))
+        self.perm.speakers.add(self.user4)
+        self.assertTrue(self.trec4.is_listener(self.user2))
+        self.perm.speakers.remove(self.user4)
+        self.assertFalse(self.trec4.is_listener(self.user2))
+
+        self.user4.accent = self.user3.accent
+        self.user4.save()
+        self.assertTrue(self.trec4.is_listener(self.user2))
+
+        self.perm.all_speakers = True
+        self.perm.accents = []
+        self.perm.save()
+        self.assertTrue(self.trec3.is_listener(self.user2))
+
+        # The permission is no longer above the shared folder
+        self.f2.parent = None
+        self.f2.save()
+        self.assertFalse(self.trec3.is_listener(self.user2))
+
+    def test_reverse_changes_invalidate(self):
+        self.assertFalse(self.trec4.is_listener(self.user2))
+        self.user4.listenerpermission_set.add(self.perm)
+        self.assertTrue(self.trec4.is_listener(self.user2))
+        self.user4.listenerpermission_set.clear()
+        self.assertFalse(self.trec4.is_listener(self.user2))
+        self.user2.lstn_permissions.remove(self.perm)
+        self.assertFalse(self.trec3.is_listener(self.user2))
+
+    def test_revoked_without_signals(self):
+        # Like a change in another process, whose signals can't delete anything from the cache of this one
+        self.assertTrue(self.trec3.is_listener(self.user2))
+        ListenerPermission.listeners.through.objects.filter(listenerpermission=self.perm).delete()
+        self.assertFalse(self.trec3.is_listener(self.user2))
+        self.perm.listeners.add(self.user2)
+        ListenerPermission.objects.filter(pk=self.perm.pk).update(accents=[], version=uuid.uuid4())
+        self.assertFalse(self.trec3.is_listener(self.user2))
+
+    def test_stale_save_gets_new_version(self):
+        stale = ListenerPermission.objects.get(pk=self.perm.pk)
+        self.perm.speakers.add(self.user4)
+        self.assertTrue(self.trec4.is_listener(self.user2))
+        versions = {stale.version, ListenerPermission.objects.get(pk=self.perm.pk).version}
+        stale.save(update_fields=['accents'])
+        self.assertNotIn(ListenerPermission.objects.get(pk=self.perm.pk).version, versions)
+
+    def test_unrelated_changes_keep_cache(self):
+        perm = ListenerPermission.objects.create(folder=self.f2, accents=[])
+        perm.listeners.add(self.user3)
+        perm.speakers.add(self.user4)
+        self.assertFalse(self.trec3.is_listener(self.user3))
+        self.assertTrue(self.trec3.is_listener(self.user2))
+        other = Folder.objects.create(name='f3', owner=self.user1)
+        ListenerPermission.objects.create(folder=other, all_speakers=True, accents=[]).listeners.add(self.user3)
+        self.f2.set_cached_zip(self.f2.get_download_fingerprint())
+        self.user1.accent = self.user3.accent
+        self.user1.save()
+        with mock.patch.object(permissions, 'combine_permissions', wraps=permissions.combine_permissions) as combine_permissions:
+            self.assertFalse(self.trec3.is_listener(self.user3))
+            # The speakers with the accents of the permission of user2 are not cached
+            self.assertTrue(self.trec3.is_listener(self.user2))
+            self.assertTrue(self.user1.pk in permissions.get_visible_speakers(self.f2, self.user2))
+            self.assertEqual(combine_permissions.call_count, 0)
+
+
+class TestBatchPermissions(TestCase):
+    """
+    The batch permission filters have to allow the same objects as the per-object checks
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_languages_users_groups()
+
+    def setUp(self):
+        self.users = [get_user(i) for i in range(1, 5)]
+        user1, user2, user3, user4 = self.users
+        self.f1 = Folder.objects.create(name='f1', owner=user1)
+        self.f2 = Folder.objects.create(name='f2', owner=user1, parent=self.f1)
+        self.sf3 = Folder.objects.create(name='sf3', owner=user1, parent=self.f2).make_shared_folder()
+        self.sf4 = Folder.objects.create(name='sf4', owner=user2).make_shared_folder()
+        self.sf4.public = True
+        self.sf4.save()
+        self.sf3.speaker.add(user2, user3)
+        for sf in [self.sf3, self.sf4]:
+            text = Text.objects.create(title='t1', shared_folder=sf, textfile='test_resources/testtext.txt')
+            for speaker in [user3, user4]:
+                trec = TextRecording.objects.create(speaker=speaker, text=text)
+                SentenceRecording.objects.bulk_create([
+                    SentenceRecording(recording=trec, sentence=sentence, audiofile='test_resources/s1.wav')
+                    for sentence in text.sentences.filter(index__lte=2)
+                ])
+        perm = ListenerPermission.objects.create(folder=self.f2, accents=[user3.accent])
+        perm.listeners.add(user2)
+        perm = ListenerPermission.objects.create(folder=self.sf4, all_speakers=True)
+        perm.listeners.add(user1, user2)
+        self.roots = [None, 'invalid', str(self.f1.root), str(self.sf3.root)]
+
+    def tearDown(self):
+        delete_all_users()
+
+    def assertSameObjects(self, queryset, permission_classes):
+        view = types.SimpleNamespace()
+        results = set()
+        for user in self.users:
+            for root in self.roots:
+                request = types.SimpleNamespace(user=user, method='GET', query_params={} if root is None else {'root': root})
+                perms = [permission() for permission in permission_classes]
+                expected = {obj.pk for obj in queryset
+                            if all(perm.has_object_permission(request, view, obj) for perm in perms)}
+                filtered = user_permissions.filter_permitted(request, view, queryset, permission_classes)
+                self.assertEqual(set(filtered.values_list('pk', flat=True)), expected, (user.username, root))
+                results.add(frozenset(expected))
+        # The fixture has to distinguish between the users and roots
+        self.assertGreater(len(results), 1)
+
+    def test_folders(self):
+        self.assertSameObjects(Folder.objects.all(), [user_permissions.IsOwner])
+        self.assertSameObjects(Folder.objects.all(), [user_permissions.IsListener])
+        self.assertSameObjects(Folder.objects.all(), [rf_permissions.IsAuthenticated, permissions.IsRoot | permissions.BelowRoot])
+
+    def test_sharedfolders(self):
+        self.assertSameObjects(SharedFolder.objects.all(), [user_permissions.IsSpeaker | permissions.BelowRoot | permissions.IsRoot])
+        self.assertSameObjects(SharedFolder.objects.all(), [user_permissions.IsListener])
+        self.assertSameObjects(SharedFolder.objects.all(), [user_permissions.IsOwner, ~user_permissions.IsSpeaker])
+
+    def test_texts(self):
+        self.assertSameObjects(Text.objects.all(), [user_permissions.IsSpeaker | permissions.BelowRoot])
+        self.assertSameObjects(Text.objects.all(), [user_permissions.IsListener])
+        self.assertSameObjects(Text.objects.all(), [user_permissions.IsOwner])
+
+    def test_recordings(self):
+        permission_classes = [user_permissions.IsSpeaker | user_permissions.IsOwner | user_permissions.IsListener]
+        self.assertSameObjects(TextRecording.objects.all(), permission_classes)
+        self.assertSameObjects(SentenceRecording.objects.all(), permission_classes)
+        self.assertSameObjects(TextRecording.objects.all(), [permissions.BelowRoot])
+
+    def test_listener_permissions(self):
+        self.assertSameObjects(ListenerPermission.objects.all(), [user_permissions.IsOwner])
+
+    def test_constant_number_of_queries(self):
+        request = types.SimpleNamespace(user=self.users[1], method='GET', query_params={})
+        permission_classes = [user_permissions.IsSpeaker | user_permissions.IsOwner | user_permissions.IsListener]
+        # The listener permissions and their speakers
+        with self.assertNumQueries(3):
+            list(user_permissions.filter_permitted(request, types.SimpleNamespace(), SentenceRecording.objects.all(), permission_classes))
+
+    def test_unsupported_permission(self):
+        class IsAnything(rf_permissions.BasePermission):
+            def has_object_permission(self, request, view, obj):
+                return True
+
+        request = types.SimpleNamespace(user=self.users[0], method='GET', query_params={})
+        with self.assertRaises(ImproperlyConfigured):
+            user_permissions.filter_permitted(request, types.SimpleNamespace(), Folder.objects.all(), [IsAnything])
+
+
+class TestDownloadCache(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_languages_users_groups()
+
+    def setUp(self):
+        self.user1 = CustomUser.objects.get(username=USER_DATA_CORRECT_1['username'])
+        self.user2 = CustomUser.objects.get(username=USER_DATA_CORRECT_2['username'])
+        self.folder = Folder.objects.create(name='f1', owner=self.user1).make_shared_folder()
+        self.text = Text.objects.create(title='t1', shared_folder=self.folder, textfile='test_resources/testtext.txt')
+        self.trec = TextRecording.objects.create(speaker=self.user2, text=self.text)
+        # bulk_create skips the audio analysis in SentenceRecording.save
+        SentenceRecording.objects.bulk_create([
+            SentenceRecording(recording=self.trec, sentence=sentence, audiofile=f'test_resources/s{sentence.index}.wav')
+            for sentence in self.text.sentences.all()
+        ])
+        self.trec.update_srec_count()
+
+    def tearDown(self):
+        delete_all_users()
+
+    def test_zip_is_reused(self):
+        with mock.patch('textmgmt.utils.write_zip', wraps=utils.write_zip) as write_zip:
+            zip_path = self.folder.create_zip_for_download()
+            self.assertEqual(self.folder.create_zip_for_download(), zip_path)
+            self.assertEqual(write_zip.call_count, 1)
+        self.assertTrue(default_storage.exists(zip_path))
+
+    def test_fingerprint_is_passed_along(self):
+        fingerprint = self.folder.get_download_fingerprint()
+        with mock.patch.object(SharedFolder, 'get_download_fingerprint') as get_download_fingerprint:
+            self.assertIsNone(self.folder.get_cached_zip(fingerprint))
+            b''.join(self.folder.stream_zip_for_download(fingerprint))
+            self.assertIsNotNone(self.folder.create_zip_for_download(fingerprint))
+            get_download_fingerprint.assert_not_called()
+
+    def test_zip_is_rebuilt_after_change(self):
+        zip_path = self.folder.create_zip_for_download()
+        self.trec.srecs.filter(sentence__index=2).update(last_updated=timezone.now() + datetime.timedelta(seconds=1))
+        new_zip_path = self.folder.create_zip_for_download()
+        self.assertNotEqual(new_zip_path, zip_path)
+        self.assertFalse(default_storage.exists(zip_path))
+        self.assertTrue(default_storage.exists(new_zip_path))
+
+    def test_incomplete_stream_is_not_cached(self):
+        stream = self.folder.stream_zip_for_download()
+        next(stream)
+        stream.close()
+        self.assertIsNone(self.folder.get_cached_zip())
+        b''.join(self.folder.stream_zip_for_download())
+        self.assertIsNotNone(self.folder.get_cached_zip())
+
+    def test_concurrent_streams(self):
+        stream1 = self.folder.stream_zip_for_download()
+        stream2 = self.folder.stream_zip_for_download()
+        data1 = [next(stream1)]
+        data2 = b''.join(stream2)
+        data1 = b''.join(itertools.chain(data1, stream1))
+        self.assertEqual(len(data1), len(data2))
+        zip_path = self.folder.get_cached_zip()
+        with default_storage.open(zip_path, 'rb') as f:
+            self.assertIsNone(zipfile.ZipFile(f).testzip())
+        _, files = default_storage.listdir(self.folder.get_path())
+        self.assertEqual([name for name in files if name.startswith('download_')], [zip_path.split('/')[-1]])
+
+    def test_zip_is_rebuilt_after_speaker_change(self):
+        fingerprint = self.folder.get_download_fingerprint()
+        CustomUser.objects.filter(pk=self.user2.pk).update(gender='N' if self.user2.gender != 'N' else 'F')
+        self.assertNotEqual(self.folder.get_download_fingerprint(), fingerprint)
+        fingerprint = self.folder.get_download_fingerprint()
+        self.trec.TTS_permission = not self.trec.TTS_permission
+        self.trec.save()
+        self.assertNotEqual(self.folder.get_download_fingerprint(), fingerprint)
+
+    def test_zip_is_rebuilt_after_log_change(self):
+        fingerprint = self.folder.get_download_fingerprint()
+        self.folder.add_user_to_log(self.user2)
+        self.assertNotEqual(self.folder.get_download_fingerprint(), fingerprint)
+        fingerprint = self.folder.get_download_fingerprint()
+        CustomUser.objects.filter(pk=self.user2.pk).update(email='changed@example.com')
+        self.assertNotEqual(self.folder.get_download_fingerprint(), fingerprint)
+
+
+class TestSpeakerLog(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_languages_users_groups()
+
+    def setUp(self):
+        self.user1 = CustomUser.objects.get(username=USER_DATA_CORRECT_1['username'])
+        self.user2 = CustomUser.objects.get(username=USER_DATA_CORRECT_2['username'])
+        self.user3 = CustomUser.objects.get(username=USER_DATA_CORRECT_3['username'])
+        self.folder = Folder.objects.create(name='f1', owner=self.user1).make_shared_folder()
+        self.text = Text.objects.create(title='t1', shared_folder=self.folder, textfile='test_resources/testtext.txt')
+
+    def tearDown(self):
+        delete_all_users()
+
+    def expected_entry(self, user):
+        return f'username: {user.username}\nemail: {user.email}\ndate_joined: {user.date_joined}\n' \
+               f'birth_year: {user.birth_year}\n#\n'
+
+    def test_user_is_added_once(self):
+        self.assertFalse(self.folder.log_contains_user(self.user2.username))
+        self.folder.add_user_to_log(self.user2)
+        self.folder.add_user_to_log(self.user3)
+        self.folder.add_user_to_log(self.user2)
+        self.assertTrue(self.folder.log_contains_user(self.user2.username))
+        self.assertEqual(SpeakerLog.objects.filter(shared_folder=self.folder).count(), 2)
+        self.assertEqual(self.folder.render_log(), self.expected_entry(self.user2) + self.expected_entry(self.user3))
+
+    def test_download_contains_log(self):
+        self.folder.add_user_to_log(self.user2)
+        with zipfile.ZipFile(io.BytesIO(b''.join(self.folder.stream_zip_for_download()))) as archive:
+            self.assertEqual(archive.read(self.folder.get_log_name()).decode('utf-8'), self.expected_entry(self.user2))
+
+    def test_updatelogs(self):
+        for user in [self.user3, self.user2, self.user3]:
+            TextRecording.objects.get_or_create(speaker=user, text=self.text)
+        self.folder.add_user_to_log(self.user3)
+        call_command('updatelogs', stdout=io.StringIO())
+        call_command('updatelogs', stdout=io.StringIO())
+        self.assertEqual(self.folder.render_log(), self.expected_entry(self.user3) + self.expected_entry(self.user2))
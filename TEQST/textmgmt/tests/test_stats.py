@@ -0,0 +1,182 @@
+from django.test import TestCase
+from django.core.cache import cache
+from django.utils import timezone
+from textmgmt.models import Folder, SharedFolder, Text
+from textmgmt import permissions, stats
+from usermgmt.tests.utils import *
+from recordingmgmt.models import TextRecording, SentenceRecording, SentenceRecordingBackup
+from usermgmt.models import CustomUser
+from unittest import mock
+import uuid
+
+
+class TestSharedFolderStats(TestCase):
+    """
+    SentenceRecordings are bulk created, so the audio analysis in SentenceRecording.save is skipped.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_languages_users_groups()
+
+    def setUp(self):
+        self.user1 = get_user(1)
+        self.f1 = Folder.objects.create(name='f1', owner=self.user1).make_shared_folder()
+        self.texts = [
+            Text.objects.create(title='text1', shared_folder=self.f1, textfile='test_resources/testtext.txt'),
+            Text.objects.create(title='text2', shared_folder=self.f1, textfile='test_resources/testtext2.txt'),
+        ]
+
+    def tearDown(self):
+        delete_all_users()
+
+    def record(self, user, text, count, legacy=False):
+        trec = TextRecording.objects.create(speaker=user, text=text, rec_time_without_rep_old=1.5, rec_time_with_rep_old=2.0)
+        SentenceRecording.objects.bulk_create([
+            SentenceRecording(recording=trec, sentence=sentence, audiofile='test_resources/s1.wav', length=sentence.index + 0.25, legacy=legacy)
+            for sentence in text.sentences.all()[:count]
+        ])
+        trec.update_srec_count()
+        return trec
+
+    def test_matches_textrecording_properties(self):
+        user2, user4 = get_user(2), get_user(4)
+        self.f1.speaker.add(user2, user4)
+        trec = self.record(user2, self.texts[0], 2)
+        SentenceRecordingBackup.objects.create(recording=trec.srecs.first(), audiofile='test_resources/s2.wav', length=0.5, last_updated=timezone.now())
+        self.record(user4, self.texts[0], 3, legacy=True)
+        self.record(user4, self.texts[1], 1)
+
+        result = stats.sharedfolder_stats(self.f1)
+        self.assertEqual([spk['name'] for spk in result], sorted([user2.username, user4.username]))
+        for spk in result:
+            self.assertEqual([txt['title'] for txt in spk['texts']], ['text1', 'text2'])
+            for text, txt in zip(self.texts, spk['texts']):
+                self.assertEqual(txt['total'], text.sentence_count())
+                trec = TextRecording.objects.filter(speaker__username=spk['name'], text=text).first()
+                if trec is None:
+                    self.assertEqual(txt, {'title': text.title, 'finished': 0, 'total': text.sentence_count()})
+                    continue
+                self.assertEqual(txt['finished'], trec.active_sentence() - 1)
+                self.assertAlmostEqual(txt['rec_time_without_rep'], trec.rec_time_without_rep)
+                self.assertAlmostEqual(txt['rec_time_with_rep'], trec.rec_time_with_rep)
+
+        for spk in stats.text_stats(self.texts[0]):
+            trec = TextRecording.objects.get(speaker__username=spk['name'], text=self.texts[0])
+            self.assertEqual(spk['textrecording_id'], trec.pk)
+            self.assertEqual(spk['finished'], trec.active_sentence() - 1)
+            self.assertAlmostEqual(spk['rec_time_with_rep'], trec.rec_time_with_rep)
+
+    def test_with_times_matches_properties(self):
+        user2, user4 = get_user(2), get_user(4)
+        trec = self.record(user2, self.texts[0], 2)
+        SentenceRecordingBackup.objects.create(recording=trec.srecs.first(), audiofile='test_resources/s2.wav', length=0.5, last_updated=timezone.now())
+        self.record(user4, self.texts[0], 3, legacy=True)
+        self.record(user4, self.texts[1], 0)
+
+        expected = [(trec.rec_time_without_rep, trec.rec_time_with_rep, trec.last_updated) for trec in TextRecording.objects.all()]
+        with self.assertNumQueries(1):
+            annotated = [(trec.rec_time_without_rep, trec.rec_time_with_rep, trec.last_updated)
+                         for trec in TextRecording.objects.with_times()]
+        self.assertEqual(len(annotated), 3)
+        for (without_rep, with_rep, last_updated), (expected_without_rep, expected_with_rep, expected_last_updated) in zip(annotated, expected):
+            self.assertAlmostEqual(without_rep, expected_without_rep)
+            self.assertAlmostEqual(with_rep, expected_with_rep)
+            self.assertEqual(last_updated, expected_last_updated)
+
+    def test_constant_number_of_queries(self):
+        for i in [2, 3, 4]:
+            user = get_user(i)
+            self.f1.speaker.add(user)
+            for text in self.texts:
+                self.record(user, text, 2)
+        # texts, speakers and textrecordings with their times
+        with self.assertNumQueries(3):
+            result = stats.sharedfolder_stats(self.f1)
+        self.assertEqual(len(result), 3)
+        with self.assertNumQueries(2):
+            stats.text_stats(self.texts[0])
+
+
+class TestStatsCache(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_languages_users_groups()
+
+    def setUp(self):
+        cache.clear()
+        self.user1 = get_user(1)
+        self.user2 = get_user(2)
+        self.f1 = Folder.objects.create(name='f1', owner=self.user1).make_shared_folder()
+        self.f1.speaker.add(self.user2)
+        self.text = Text.objects.create(title='text1', shared_folder=self.f1, textfile='test_resources/testtext.txt')
+        self.trec = TextRecording.objects.create(speaker=self.user2, text=self.text)
+
+    def tearDown(self):
+        delete_all_users()
+
+    def assertRecomputed(self, func, obj, recomputed=True):
+        with mock.patch.object(stats, 'sharedfolder_stats', wraps=stats.sharedfolder_stats) as sharedfolder_stats, \
+                mock.patch.object(stats, 'text_stats', wraps=stats.text_stats) as text_stats:
+            result = func(obj)
+        self.assertEqual(sharedfolder_stats.call_count + text_stats.call_count, int(recomputed))
+        return result
+
+    def test_stats_are_cached(self):
+        for func, obj in [(stats.cached_sharedfolder_stats, self.f1), (stats.cached_text_stats, self.text)]:
+            self.assertRecomputed(func, obj)
+            self.assertRecomputed(func, obj, recomputed=False)
+
+    def test_recordings_invalidate(self):
+        self.assertEqual(self.assertRecomputed(stats.cached_text_stats, self.text)[0]['finished'], 0)
+        srec = SentenceRecording(recording=self.trec, sentence=self.text.sentences.get(index=1), audiofile='test_resources/s1.wav')
+        with mock.patch('recordingmgmt.jobs.enqueue'):
+            srec.save()
+        self.assertEqual(self.assertRecomputed(stats.cached_text_stats, self.text)[0]['finished'], 1)
+        self.assertRecomputed(stats.cached_sharedfolder_stats, self.f1)
+        self.assertRecomputed(stats.cached_sharedfolder_stats, self.f1, recomputed=False)
+
+        SentenceRecordingBackup.objects.create(recording=srec, audiofile='test_resources/s2.wav', length=0.5, last_updated=timezone.now())
+        self.assertRecomputed(stats.cached_sharedfolder_stats, self.f1)
+        srec.delete()
+        self.assertEqual(self.assertRecomputed(stats.cached_text_stats, self.text)[0]['finished'], 0)
+
+    def test_version_is_stored_in_the_database(self):
+        version = stats.get_stats_version(self.f1.pk)
+        self.assertRecomputed(stats.cached_text_stats, self.text)
+        stats.invalidate_stats(self.f1.pk)
+        self.assertNotEqual(SharedFolder.objects.get(pk=self.f1.pk).stats_version, version)
+        # Like an invalidation in another process, which can't delete anything from the cache of this one
+        SharedFolder.objects.filter(pk=self.f1.pk).update(stats_version=uuid.uuid4())
+        self.assertRecomputed(stats.cached_text_stats, self.text)
+        self.assertRecomputed(stats.cached_text_stats, self.text, recomputed=False)
+
+    def test_speakers_invalidate(self):
+        user3 = get_user(3)
+        self.assertRecomputed(stats.cached_sharedfolder_stats, self.f1)
+        self.f1.speaker.add(user3)
+        self.assertEqual(len(self.assertRecomputed(stats.cached_sharedfolder_stats, self.f1)), 2)
+        user3.sharedfolder.remove(self.f1)
+        self.assertEqual(len(self.assertRecomputed(stats.cached_sharedfolder_stats, self.f1)), 1)
+
+    def test_user_filter(self):
+        self.f1.speaker.add(get_user(3))
+        result = self.assertRecomputed(stats.cached_sharedfolder_stats, self.f1)
+        self.assertEqual(len(result), 2)
+        user_filter = CustomUser.objects.filter(pk=self.user2.pk)
+        result = self.assertRecomputed(lambda sf: stats.cached_sharedfolder_stats(sf, user_filter), self.f1)
+        self.assertEqual([spk['name'] for spk in result], [self.user2.username])
+        self.assertRecomputed(lambda sf: stats.cached_sharedfolder_stats(sf, user_filter), self.f1, recomputed=False)
+
+    def test_speaker_set_filter(self):
+        self.f1.speaker.add(get_user(3))
+        speakers = permissions.SpeakerSet([self.user2.pk])
+        with self.assertNumQueries(0):
+            key = stats.get_filter_key(speakers)
+        self.assertEqual(key, stats.get_filter_key(CustomUser.objects.filter(pk=self.user2.pk)))
+        result = self.assertRecomputed(lambda sf: stats.cached_sharedfolder_stats(sf, speakers), self.f1)
+        self.assertEqual([spk['name'] for spk in result], [self.user2.username])
+        self.assertEqual(stats.get_filter_key(permissions.SpeakerSet(all_speakers=True)), stats.get_filter_key(None))
@@ -0,0 +1,85 @@
+from django.test import TestCase
+from textmgmt.models import Folder, Text
+from textmgmt import stm, utils
+from usermgmt.tests.utils import *
+from recordingmgmt.models import TextRecording, SentenceRecording
+
+import io, pathlib, zipfile
+
+
+class TestSharedFolderStm(TestCase):
+    """
+    SentenceRecordings are bulk created, so the audio analysis in SentenceRecording.save is skipped.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_languages_users_groups()
+
+    def setUp(self):
+        self.f1 = Folder.objects.create(name='f1', owner=get_user(1)).make_shared_folder()
+        # testtext.txt has exactly 3 sentences
+        self.t1 = Text.objects.create(title='text', shared_folder=self.f1, textfile='test_resources/testtext.txt')
+
+    def tearDown(self):
+        delete_all_users()
+
+    def record(self, user, count=3, assemble=True):
+        trec = TextRecording.objects.create(speaker=user, text=self.t1)
+        SentenceRecording.objects.bulk_create([
+            SentenceRecording(recording=trec, sentence=sentence, audiofile=f'test_resources/s{sentence.index}.wav',
+                              length=sentence.index + 0.5)
+            for sentence in self.t1.sentences.all()[:count]
+        ])
+        trec.update_srec_count()
+        if assemble:
+            trec.assemble_audiofile()
+        return trec
+
+    def generate(self):
+        return b''.join(stm.sharedfolder_stm(self.f1)).decode('utf-8')
+
+    def test_entries_match_frame_index(self):
+        user2, user3 = get_user(2), get_user(3)
+        tr2 = self.record(user2)
+        tr3 = self.record(user3)
+        self.record(get_user(4), count=2)
+        content = self.generate()
+
+        header = utils.create_headers({user2, user3})
+        self.assertTrue(content.startswith(header))
+        lines = content[len(header):].splitlines()
+        expected = []
+        # Recordings are ordered by speaker username
+        for trec in sorted([tr2, tr3], key=lambda trec: trec.speaker.username):
+            trec.refresh_from_db()
+            speaker = trec.speaker
+            stem = pathlib.PurePath(trec.audiofile.name).stem
+            for srec in trec.srecs.select_related('sentence'):
+                start = srec.frame_offset / trec.framerate
+                end = (srec.frame_offset + srec.frame_count) / trec.framerate
+                expected.append(
+                    f'{stem}_{speaker.username}_{round(start * 100):07d}_{round(end * 100):07d} {stem} {trec.nchannels} '
+                    f'{speaker.username} {start:.2f} {end:.2f} <{speaker.gender},{speaker.education},SRTTS,'
+                    f'{speaker.country},{speaker.accent}> {srec.sentence.content}'
+                )
+        self.assertEqual(lines, expected)
+
+    def test_legacy_recordings_use_lengths(self):
+        trec = self.record(get_user(2), assemble=False)
+        lines = self.generate().splitlines()[-3:]
+        self.assertEqual([line.split(' ')[4:6] for line in lines], [['0.00', '1.50'], ['1.50', '4.00'], ['4.00', '7.50']])
+        self.assertEqual(lines[0].split(' ')[2], str(stm.DEFAULT_NCHANNELS))
+
+    def test_queries(self):
+        for i in range(2, 5):
+            self.record(get_user(i), assemble=False)
+        # headers and entries
+        with self.assertNumQueries(2):
+            self.generate()
+
+    def test_download_contains_stm(self):
+        self.record(get_user(2))
+        with zipfile.ZipFile(io.BytesIO(b''.join(self.f1.stream_zip_for_download()))) as zf:
+            self.assertEqual(zf.read(self.f1.get_stm_name()).decode('utf-8'), self.generate())
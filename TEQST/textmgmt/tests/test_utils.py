@@ -0,0 +1,232 @@
+from django.test import SimpleTestCase
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from textmgmt import utils
+
+from unittest import mock
+
+import chardet, io, random, re, zipfile
+
+
+class TestStreamZip(SimpleTestCase):
+
+    def setUp(self):
+        self.members = [
+            ('s1.wav', 'test_resources/s1.wav'),
+            ('Texts/testtext.txt', 'test_resources/testtext.txt'),
+        ]
+
+    def test_stream_zip(self):
+        chunks = list(utils.stream_zip(self.members))
+        self.assertGreater(len(chunks), 1)
+        with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(zf.namelist(), ['s1.wav', 'Texts/testtext.txt'])
+            self.assertEqual(zf.getinfo('s1.wav').compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(zf.getinfo('Texts/testtext.txt').compress_type, zipfile.ZIP_DEFLATED)
+            for arcname, name in self.members:
+                with open(settings.MEDIA_ROOT/name, 'rb') as f:
+                    self.assertEqual(zf.read(arcname), f.read())
+
+    def test_write_zip_matches_stream(self):
+        f = io.BytesIO()
+        for _ in utils.write_zip(f, self.members):
+            pass
+        with zipfile.ZipFile(f) as zf:
+            self.assertEqual(zf.namelist(), ['s1.wav', 'Texts/testtext.txt'])
+            self.assertIsNone(zf.testzip())
+
+
+def split_str_recursive(str_, max_len=None):
+    """
+    The former recursive implementation of utils.split_str, which tokenized every part again
+    """
+    if max_len is None or len(str_) <= max_len:
+        return [str_]
+    strings = re.split('([,;:.?!])', str_)
+    if strings[0].strip() == '':
+        strings[2] = strings[1] + strings[2]
+        del strings[0:2]
+    for i in range(2, len(strings), 2):
+        if strings[i].strip() == '':
+            strings[i-2] = strings[i-2] + strings[i-1]
+            del strings[i-1:i+1]
+    if len(strings) <= 1:
+        strings = re.split('([ ])', str_)
+    limit = 0
+    len_start, len_end = 0, len(str_)
+    for i in range(0, len(strings), 2):
+        word_len = len(strings[i].strip())
+        if abs(len_end - len_start) < abs(len_end - len_start - 2*word_len):
+            limit = i
+            break
+        len_end -= word_len
+        len_start += word_len
+    return split_str_recursive(''.join(strings[:limit]).strip(), max_len=max_len) \
+        + split_str_recursive(''.join(strings[limit:]).strip(), max_len=max_len)
+
+
+class TestSplitStr(SimpleTestCase):
+
+    TOKENS = ['a', 'bb', 'Satz', 'Paragraph', ' ', ' ', ' ', '\n', '\t', '\xa0', ',', '.', '?', '!', ';', ':', '. ', ', ']
+
+    def assert_same_as_recursive(self, str_, max_len):
+        try:
+            expected = split_str_recursive(str_, max_len)
+        except (IndexError, RecursionError):
+            # The recursive implementation failed on consecutive punctuation marks and unsplittable words
+            parts = utils.split_str(str_, max_len)
+            self.assertEqual(''.join(''.join(parts).split()), ''.join(str_.split()))
+            for part in parts:
+                if len(part) > max_len:
+                    self.assertIsNone(re.search('[ ,;:.?!]', part[:-1]), (str_, max_len, part))
+            return False
+        self.assertEqual(utils.split_str(str_, max_len), expected, (str_, max_len))
+        return True
+
+    def test_random_strings(self):
+        rnd = random.Random(0)
+        compared = 0
+        for _ in range(5000):
+            str_ = ''.join(rnd.choice(self.TOKENS) for _ in range(rnd.randint(0, 60)))
+            compared += self.assert_same_as_recursive(str_, rnd.randint(1, 40))
+        self.assertGreater(compared, 1000)
+
+    def test_random_sentences(self):
+        rnd = random.Random(1)
+        words = ['The', 'party', 'shall', 'notwithstanding', 'section', '12', 'hereinafter', '§']
+        compared = 0
+        for _ in range(200):
+            str_ = ' '.join(rnd.choice(words) + rnd.choice(['', '', ',', ';', '.', '?']) for _ in range(rnd.randint(1, 300)))
+            compared += self.assert_same_as_recursive(str_, rnd.randint(20, 200))
+        self.assertGreater(compared, 150)
+
+    def test_no_max_len(self):
+        self.assertEqual(utils.split_str('a, b. c', None), ['a, b. c'])
+
+    def test_ellipsis(self):
+        self.assertEqual(utils.split_str('First part... second part', 15), ['First part...', 'second part'])
+
+    def test_long_text_without_punctuation(self):
+        str_ = ' '.join(['word'] * 20000)
+        parts = utils.split_str(str_, 10)
+        self.assertEqual(parts, split_str_recursive(str_, 10))
+        self.assertEqual(' '.join(parts), str_)
+        self.assertLessEqual(max(len(part) for part in parts), 10)
+
+    def test_long_words(self):
+        # The words are too long for a balanced split
+        self.assertEqual(utils.split_str('a, b. c d e f g', 3), ['a,', 'b.', 'c d', 'e', 'f g'])
+
+    def test_long_word(self):
+        self.assertEqual(utils.split_str('x' * 20, 10), ['x' * 20])
+
+
+class TestMakeSentences(SimpleTestCase):
+
+    def test_matches_file_content(self):
+        section = ['First sentence.', ' Two\nlines ', '', '  ', 'Blank\n \nline inside', 'Ünïcödé ✓']
+        file = utils.make_file(section, 'name')
+        expected = list(utils.group_sentences(l.decode('utf-8-sig') for l in file.readlines()))
+        self.assertEqual(utils.make_sentences(section), expected)
+        self.assertEqual(expected, ['First sentence.', 'Two lines', 'Blank', 'line inside', 'Ünïcödé ✓'])
+
+
+class TestDetectEncoding(SimpleTestCase):
+
+    def test_utf8(self):
+        self.assertEqual(utils.detect_encoding('Grüße'.encode('utf-8')), 'utf-8')
+        self.assertEqual(utils.detect_encoding(b'plain ascii'), 'utf-8')
+
+    def test_byte_order_marks(self):
+        for encoding in ['utf-8-sig', 'utf-16', 'utf-32']:
+            content = 'Grüße'.encode(encoding)
+            detected = utils.detect_encoding(content)
+            self.assertEqual(content.decode(detected), 'Grüße')
+
+    def test_other_encodings_use_bounded_sample(self):
+        content = ('Grüße aus Köln, das Wetter ist schön.\n\n' * 10000).encode('cp1252')
+        with mock.patch('chardet.detect', wraps=chardet.detect) as detect:
+            detected = utils.detect_encoding(content)
+        self.assertEqual(len(detect.call_args[0][0]), utils.ENCODING_SAMPLE_SIZE)
+        self.assertEqual(content.decode(detected), content.decode('cp1252'))
+
+
+def fake_sent_tokenize(text, language='english'):
+    # Splits after every '.', like punkt the sentences are substrings of the text
+    return [m.group().strip() for m in re.finditer(r'[^.]+\.?', text) if m.group().strip()]
+
+
+class FakeTokenizer:
+
+    def tokenize(self, text):
+        return fake_sent_tokenize(text)
+
+
+def fake_load_sentence_tokenizer(lang):
+    if lang == 'klingon':
+        raise LookupError(lang)
+    return FakeTokenizer()
+
+
+class TestSentenceTokenizers(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(utils, '_sentence_tokenizers', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_loaded_once_per_language(self):
+        with mock.patch.object(utils, 'load_sentence_tokenizer', side_effect=fake_load_sentence_tokenizer) as load:
+            english = utils.get_sentence_tokenizer('English')
+            self.assertIs(utils.get_sentence_tokenizer('english'), english)
+            self.assertIsNot(utils.get_sentence_tokenizer('german'), english)
+        self.assertEqual([c.args for c in load.call_args_list], [('english',), ('german',)])
+
+    def test_preload(self):
+        with mock.patch.object(utils, 'load_sentence_tokenizer', side_effect=fake_load_sentence_tokenizer):
+            self.assertEqual(utils.preload_sentence_tokenizers(['English', 'Klingon']), ['english'])
+        self.assertEqual(list(utils._sentence_tokenizers), ['english'])
+
+
+class TestParseFile(SimpleTestCase):
+
+    CONTENT = 'Erster Absatz.\r\nZweite Zeile.\r\n\r\nGrüße\n\n\n\nDritter\rAbsatz.\r\r' * 50
+
+    def parse(self, content, **kwargs):
+        file = SimpleUploadedFile('upload.txt', content.encode('utf-8'))
+        return utils.parse_file(file, **kwargs)
+
+    def expected(self, separator):
+        content = self.CONTENT.replace('\r\n', '\n').replace('\r', '\n')
+        return [re.sub('\n+', '\n', x) for x in re.split(separator, content)]
+
+    def test_matches_splitting_the_whole_content(self):
+        for separator in ['\n\n', '\n\n+', '\n', '(\n)\n', 'Absatz']:
+            for chunk_size in [7, 64, utils.PARSE_CHUNK_SIZE]:
+                with mock.patch.object(utils, 'PARSE_CHUNK_SIZE', chunk_size), mock.patch.object(utils, 'SEPARATOR_MARGIN', 4):
+                    self.assertEqual(list(self.parse(self.CONTENT, separator=separator)), self.expected(separator))
+
+    def test_is_lazy(self):
+        with mock.patch.object(utils, 'PARSE_CHUNK_SIZE', 64):
+            content = self.parse(self.CONTENT)
+            self.assertEqual(next(content), 'Erster Absatz.\nZweite Zeile.')
+
+    @mock.patch.object(utils, '_sentence_tokenizers', {'english': FakeTokenizer()})
+    def test_tokenize(self):
+        with mock.patch.object(utils, 'PARSE_CHUNK_SIZE', 100):
+            sentences = list(self.parse(self.CONTENT, tknz=True))
+        content = self.CONTENT.replace('\r\n', '\n').replace('\r', '\n')
+        self.assertEqual(sentences, [re.sub('\n+', '\n', x) for x in fake_sent_tokenize(content)])
+
+    def test_tokenize_without_boundaries(self):
+        tokenizer = FakeTokenizer()
+        content = 'word ' * 10000
+        chunks = [content[i:i + 10] for i in range(0, len(content), 10)]
+        with mock.patch.object(utils, '_sentence_tokenizers', {'english': tokenizer}), \
+                mock.patch.object(utils, 'PARSE_CHUNK_SIZE', 100), \
+                mock.patch.object(tokenizer, 'tokenize', wraps=tokenizer.tokenize) as tokenize:
+            sentences = list(utils.tokenize_stream(chunks))
+        self.assertEqual(sentences, [content.strip()])
+        # The pending text is not tokenized again for every chunk
+        self.assertLess(tokenize.call_count, 20)
@@ -1,4 +1,6 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.urls import reverse
 from django.conf import settings
 from usermgmt.tests.utils import *
@@ -9,6 +11,8 @@ from recordingmgmt.models import TextRecording, SentenceRecording
 
 import shutil
 from django.core.files import File
+from django.core.files.uploadedfile import SimpleUploadedFile
+from unittest import mock
 
 
 class TestFolderListView(TestCase):
@@ -595,6 +599,50 @@ class TestSpeakerTextListView(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.json()['texts']), 2)
     
+    def test_spk_text_list_progress(self):
+        # setup
+        user1 = CustomUser.objects.get(username=USER_DATA_CORRECT_1['username'])
+        user2 = CustomUser.objects.get(username=USER_DATA_CORRECT_2['username'])
+        f1 = Folder.objects.create(name='f1', owner=user1).make_shared_folder()
+        t1 = Text.objects.create(title='test', shared_folder=f1, textfile='test_resources/testtext.txt')
+        t2 = Text.objects.create(title='test2', shared_folder=f1, textfile='test_resources/testtext2.txt')
+        f1.speaker.add(user2)
+        trec = TextRecording.objects.create(speaker=user2, text=t1)
+        SentenceRecording.objects.bulk_create([
+            SentenceRecording(recording=trec, sentence=sentence, audiofile=f'test_resources/s{sentence.index}.wav', length=2.0)
+            for sentence in t1.sentences.filter(index__lte=2)
+        ])
+        trec.update_srec_count()
+        # test
+        response = self.client.get(reverse("sharedfolder-detail", args=[f1.pk]), HTTP_AUTHORIZATION=self.token_2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['texts'], [
+            {'id': t1.pk, 'title': 'test', 'words_total': t1.word_count(), 'words_finished': t1.word_count(2)},
+            {'id': t2.pk, 'title': 'test2', 'words_total': t2.word_count(), 'words_finished': 0},
+        ])
+        self.assertEqual(response.json()['timestats'], {
+            'rec_time_without_rep': trec.rec_time_without_rep, 'rec_time_with_rep': trec.rec_time_with_rep})
+
+    def test_spk_text_list_queries_do_not_depend_on_texts(self):
+        # setup
+        user1 = CustomUser.objects.get(username=USER_DATA_CORRECT_1['username'])
+        user2 = CustomUser.objects.get(username=USER_DATA_CORRECT_2['username'])
+        f1 = Folder.objects.create(name='f1', owner=user1).make_shared_folder()
+        f1.speaker.add(user2)
+        url = reverse("sharedfolder-detail", args=[f1.pk])
+        t1 = Text.objects.create(title='test', shared_folder=f1, textfile='test_resources/testtext.txt')
+        TextRecording.objects.create(speaker=user2, text=t1)
+        self.client.get(url, HTTP_AUTHORIZATION=self.token_2)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, HTTP_AUTHORIZATION=self.token_2)
+        for i in range(3):
+            t = Text.objects.create(title=f'more{i}', shared_folder=f1, textfile='test_resources/testtext.txt')
+            TextRecording.objects.create(speaker=user2, text=t)
+        # test
+        with self.assertNumQueries(len(ctx.captured_queries)):
+            response = self.client.get(url, HTTP_AUTHORIZATION=self.token_2)
+        self.assertEqual(len(response.json()['texts']), 4)
+
     def test_spk_text_list_correct_empty(self):
         # setup
         user1 = CustomUser.objects.get(username=USER_DATA_CORRECT_1['username'])
@@ -1251,4 +1299,100 @@ class TestTextStatsView(TestCase):
         f1.sharedfolder.speaker.add(user2)
         # test
         response = self.client.get(reverse("text-stats", args=[t1.pk]), HTTP_AUTHORIZATION=self.token_1)
-        self.assertEqual(response.status_code, 404)
\ No newline at end of file
+        self.assertEqual(response.status_code, 404)
+
+class TestTextUploadView(TestCase):
+    """
+    urls tested:
+    /api/pub/texts/upload-text/
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_languages_users_groups()
+
+    def setUp(self):
+        self.client = Client()
+        self.token_1 = login_test_user(1, self.client)
+
+    def tearDown(self):
+        delete_all_users()
+
+    def test_upload_does_not_read_stored_file(self):
+        # setup
+        user1 = get_user(1)
+        f1 = Folder.objects.create(name='f1', owner=user1)
+        data = {
+            'parent': f1.pk,
+            'title': 'upload',
+            'language': 'en',
+            'max_lines': 2,
+            'textfile': SimpleUploadedFile('upload.txt', 'One\n\nTwo\nlines\n\nThree\n\nFour'.encode('utf-8')),
+        }
+        # test
+        with mock.patch.object(Text, 'read_sentences', side_effect=AssertionError('textfile was read')):
+            response = self.client.post(reverse("pub-upload-text"), data, HTTP_AUTHORIZATION=self.token_1)
+        self.assertEqual(response.status_code, 201)
+        texts = Text.objects.filter(shared_folder=f1.pk).order_by('title')
+        self.assertEqual([t.title for t in texts], ['upload_001', 'upload_002'])
+        self.assertEqual([t.get_content() for t in texts], [['One', 'Two lines'], ['Three', 'Four']])
+        for text in texts:
+            self.assertEqual(text.read_sentences(), text.get_content())
+
+    def test_upload_invalidates_stats(self):
+        # setup
+        user1 = get_user(1)
+        f1 = Folder.objects.create(name='f1', owner=user1).make_shared_folder()
+        Text.objects.create(title='a', shared_folder=f1, textfile='test_resources/testtext.txt')
+        url = reverse("sharedfolder-stats", args=[f1.pk])
+        f1.speaker.add(get_user(2))
+        response = self.client.get(url, HTTP_AUTHORIZATION=self.token_1)
+        self.assertEqual(len(response.json()['speakers'][0]['texts']), 1)
+        data = {
+            'parent': f1.pk,
+            'title': 'upload',
+            'language': 'en',
+            'textfile': SimpleUploadedFile('upload.txt', 'One\n\nTwo'.encode('utf-8')),
+        }
+        response = self.client.post(reverse("pub-upload-text"), data, HTTP_AUTHORIZATION=self.token_1)
+        self.assertEqual(response.status_code, 201)
+        # test
+        response = self.client.get(url, HTTP_AUTHORIZATION=self.token_1)
+        self.assertEqual(len(response.json()['speakers'][0]['texts']), 2)
+
+    def upload_files(self, folder, workers):
+        files = [
+            SimpleUploadedFile('a.txt', 'One\n\nTwo\nlines'.encode('utf-8')),
+            SimpleUploadedFile('a.txt', 'Three, four. Five'.encode('utf-16')),
+            SimpleUploadedFile('b.txt', 'Six\n\nSeven\n\nEight'.encode('utf-8')),
+        ]
+        data = {
+            'parent': folder.pk,
+            'title': 'upload',
+            'language': 'en',
+            'max_chars': 10,
+            'naming': 'filenames',
+            'textfile': files,
+        }
+        with override_settings(TEXT_UPLOAD_WORKERS=workers):
+            response = self.client.post(reverse("pub-upload-text"), data, HTTP_AUTHORIZATION=self.token_1)
+        self.assertEqual(response.status_code, 201)
+        texts = Text.objects.filter(shared_folder=folder.pk).exclude(title='a').order_by('title')
+        return [(t.title, t.get_content(), t.sentence_total) for t in texts]
+
+    def test_upload_multiple_files(self):
+        # setup
+        user1 = get_user(1)
+        f1 = Folder.objects.create(name='f1', owner=user1).make_shared_folder()
+        Text.objects.create(title='a', shared_folder=f1, textfile='test_resources/testtext.txt')
+        f2 = Folder.objects.create(name='f2', owner=user1).make_shared_folder()
+        Text.objects.create(title='a', shared_folder=f2, textfile='test_resources/testtext.txt')
+        # test
+        expected = [
+            ('a_02', ['One', 'Two lines'], 2),
+            ('a_03', ['Three,', 'four.', 'Five'], 3),
+            ('b', ['Six', 'Seven', 'Eight'], 3),
+        ]
+        self.assertEqual(self.upload_files(f1, workers=0), expected)
+        # The files are parsed in worker processes
+        self.assertEqual(self.upload_files(f2, workers=2), expected)
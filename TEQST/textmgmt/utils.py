@@ -1,9 +1,14 @@
+from django import db
+from django.apps import apps
 from django.conf import settings
 from django.core.files import uploadedfile
+from django.core.files.storage import default_storage
 from rest_framework import exceptions
 from usermgmt.countries import COUNTRY_CHOICES
 from usermgmt.utils import GENDER_CHOICES, EDU_CHOICES
-import chardet, docx, pathlib, re
+import bisect, chardet, codecs, docx, io, itertools, operator, os, pathlib, re, threading, time, zipfile
+from concurrent import futures
+import nltk
 from nltk import tokenize
 
 NAME_ID_SPLITTER = '__'
@@ -16,13 +21,13 @@ def create_headers(speakers):
     genders = {s.gender for s in speakers}
     gender_dict = dict(GENDER_CHOICES)
     g_header = ';; CATEGORY "0" "SEX" ""\n'
-    for gender in genders:
+    for gender in sorted(genders):
         g_header += f';; LABEL "{gender}" "{gender_dict[gender]}" ""\n'
 
     edus = {s.education for s in speakers}
     edu_dict = dict(EDU_CHOICES)
     e_header = ';; CATEGORY "1" "EDUCATION" ""\n'
-    for edu in edus:
+    for edu in sorted(edus):
         e_header += f';; LABEL "{edu}" "{edu_dict[edu]}" ""\n'
 
     p_header = ';; CATEGORY "2" "PERMISSION" ""\n'
@@ -33,25 +38,19 @@ def create_headers(speakers):
     countries = {s.country for s in speakers}
     country_dict = dict(COUNTRY_CHOICES)
     c_header = ';; CATEGORY "3" "COUNTRY" ""\n'
-    for country in countries:
+    for country in sorted(countries):
         c_header += f';; LABEL "{country}" "{country_dict[country]}" ""\n'
 
     accents = {s.accent for s in speakers}
     a_header = ';; CATEGORY "4" "ACCENT" ""\n'
-    for accent in accents:
+    for accent in sorted(accents):
         a_header += f';; LABEL "{accent}" "{accent}" ""\n'
 
     return g_header + e_header + p_header + c_header + a_header
 
 
 def folder_relative_path(folder):
-    dirs = []
-    user = str(folder.owner.username)
-    while folder != None:  # go through the folders
-        dirs.append(str(folder.name))
-        folder = folder.parent
-    dirs.append(user)
-    dirs.reverse()
+    dirs = [str(folder.owner.username)] + folder.get_path_names()
     media_path = '/'.join(dirs)
     return media_path
 
@@ -63,43 +62,284 @@ def folder_path(folder):
     return path
 
 
+# Long lines are split after punctuation marks which are followed by a non-blank word, or at spaces if there are none
+SPLIT_PUNCTUATION = re.compile(r'([,;:.?!])(?=\s*[^\s,;:.?!])')
+
+
+def split_words(str_):
+    """
+    Returns the words of str_ and the punctuation marks after which it can be split, which alternate.
+    Blank words belong to the word in front of them, a blank first word to the word after it.
+    """
+    pieces = SPLIT_PUNCTUATION.split(str_)
+    if len(pieces) > 1 and not pieces[0].strip():
+        pieces[:3] = [''.join(pieces[:3])]
+    return pieces
+
+
+def find_balanced_split(words, length):
+    """
+    Returns the index of the first word which ends beyond the middle of a part of the given length, 0 if there is none.
+    Whitespace around the words doesn't count towards their lengths.
+    """
+    lengths = list(map(len, map(str.strip, words)))
+    # That is the first word for which the lengths in front of it and up to its end add up to more than the length
+    prefix = list(itertools.accumulate(lengths, initial=0))
+    i = bisect.bisect_right(list(map(operator.add, prefix, prefix[1:])), length)
+    # Empty words don't change the balance
+    while i < len(words) and lengths[i] == 0:
+        i += 1
+    return i if i < len(words) else 0
+
+
+def split_near_middle(part):
+    """
+    Returns the position after the separator nearest to the middle of part or None.
+    Used if the words are too long compared to the whitespace in between to find a balanced split.
+    """
+    middle = len(part) // 2
+    for separators in [',;:.?!', ' ']:
+        # The part after the separator must not be empty
+        positions = [i for i, char in enumerate(part[:-1]) if char in separators]
+        if positions:
+            return min(positions, key=lambda pos: abs(pos - middle)) + 1
+    return None
+
+
 def split_str(str_, max_len=None):
+    """
+    Splits str_ into parts of at most max_len characters. Parts are split near the middle after a punctuation mark
+    or at a space if there is none. Parts which can't be split any further, e.g. long words, are returned as they are.
 
-    if max_len is None:
-        return [str_]
-    
-    if len(str_) <= max_len:
+    Parts which are split after a punctuation mark or at spaces take their words from the part they were split from,
+    only the parts of the fallback split near the middle (see split_near_middle) are tokenized again.
+    """
+    if max_len is None or len(str_) <= max_len:
         return [str_]
 
-    strings = re.split('([,;:.?!])', str_)
-
-    if strings[0].strip() == '':
-        strings[2] = strings[1] + strings[2]
-        del strings[0:2]
-    for i in range(2, len(strings), 2):
-        if strings[i].strip() == '':
-            strings[i-2] = strings[i-2] + strings[i-1]
-            del strings[i-1:i+1]
-
-    if len(strings) <= 1: # fallback if no punctuation in the text, split in the middle
-        strings = re.split('([ ])', str_)
-
-    limit = 0
-    len_start, len_end = 0, len(str_)
-    # split string near the middle
-    for i in range(0, len(strings), 2):
-        word_len = len( strings[i].strip() )
-        if abs(len_end - len_start) < abs(len_end - len_start - 2*word_len):
-            limit = i
-            break
-        len_end -= word_len
-        len_start += word_len
-    return split_str(''.join(strings[:limit]).strip(), max_len=max_len) \
-        + split_str(''.join(strings[limit:]).strip(), max_len=max_len)
+    parts = []
+    # The parts are processed in order with a stack instead of recursion, the whole string is not stripped
+    stack = [split_words(str_)]
+    while stack:
+        pieces = stack.pop()
+        part = ''.join(pieces)
+        if len(part) <= max_len:
+            parts.append(part)
+            continue
+
+        if len(pieces) > 1:
+            i = find_balanced_split(pieces[::2], len(part))
+            if i:
+                left, right = pieces[:2 * i], pieces[2 * i:]
+                # The last punctuation mark of the first part belongs to its last word
+                left[-2:] = [left[-2] + left[-1]]
+                for pieces in [right, left]:
+                    pieces[0] = pieces[0].lstrip()
+                    pieces[-1] = pieces[-1].rstrip()
+                    stack.append(pieces)
+                continue
+        else:
+            # Parts without punctuation marks are split at spaces
+            words = part.split(' ')
+            i = find_balanced_split(words, len(part))
+            if i:
+                split = sum(map(len, words[:i])) + i
+                # Their parts don't have any punctuation marks to split at either
+                stack += [[part[split:].strip()], [part[:split].strip()]]
+                continue
+
+        if part.strip() != part:
+            parts.append('')
+            pieces[0] = pieces[0].lstrip()
+            pieces[-1] = pieces[-1].rstrip()
+            stack.append(pieces)
+            continue
+        split = split_near_middle(part)
+        if split is None:
+            # a single word which is too long
+            parts.append(part)
+            continue
+        stack += [split_words(part[split:].strip()), split_words(part[:split].strip())]
+    return parts
+
+
+# Byte order marks and the codecs which remove them when decoding, UTF-32 has to be checked before UTF-16
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# Number of bytes chardet looks at if the content is not UTF-8
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+# Number of bytes which are read and parsed at once
+PARSE_CHUNK_SIZE = 64 * 1024
+
+# Separator matches which end closer than this to the end of the parsed data could continue in the next chunk
+SEPARATOR_MARGIN = 1024
+
+
+def detect_file_encoding(textfile):
+    """
+    Returns the encoding of the given binary file, the file is read in chunks.
+    Byte order marks and valid UTF-8 are recognized directly, only other content is passed to chardet,
+    which only sees the first ENCODING_SAMPLE_SIZE bytes.
+    """
+    textfile.seek(0)
+    sample = textfile.read(ENCODING_SAMPLE_SIZE)
+    try:
+        for bom, encoding in BOMS:
+            if sample.startswith(bom):
+                return encoding
+        try:
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            for chunk in itertools.chain([sample], iter(lambda: textfile.read(PARSE_CHUNK_SIZE), b'')):
+                # Null bytes are valid UTF-8, but are a sign of UTF-16/32 without byte order mark
+                if b'\x00' in chunk:
+                    raise UnicodeDecodeError('utf-8', chunk, 0, len(chunk), 'null byte')
+                decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+        # chardet can't detect anything in some cases, latin-1 decodes every byte sequence
+        return chardet.detect(sample)['encoding'] or 'latin-1'
+    finally:
+        textfile.seek(0)
+
+
+def detect_encoding(content_bytes: bytes):
+    """
+    Returns the encoding of the given bytes, see detect_file_encoding
+    """
+    return detect_file_encoding(io.BytesIO(content_bytes))
+
 
+def normalize_newlines(text: str):
+    return text.replace('\r\n', '\n').replace('\r', '\n')
 
-def parse_file(textfile, separator='\n\n', tknz=False, lang='english'):
 
+def read_text_chunks(textfile):
+    """
+    Reads the binary textfile in chunks and yields the decoded text with normalized newline characters
+    """
+    decoder = codecs.getincrementaldecoder(detect_file_encoding(textfile))()
+    pending = ''
+    for chunk in iter(lambda: textfile.read(PARSE_CHUNK_SIZE), b''):
+        text = pending + decoder.decode(chunk)
+        pending = ''
+        # A '\r' at the end could be the first half of a '\r\n'
+        if text.endswith('\r'):
+            text, pending = text[:-1], '\r'
+        yield normalize_newlines(text)
+    yield normalize_newlines(pending + decoder.decode(b'', final=True))
+
+
+def split_stream(chunks, separator):
+    """
+    Yields the same parts as re.split(separator, ''.join(chunks)) without joining the chunks.
+    Separators are expected to match at most SEPARATOR_MARGIN characters.
+    """
+    pattern = re.compile(separator)
+    buffer = ''
+    # Whether the last split was an empty match at the current start of the buffer
+    skip_empty_start = False
+    # None marks the end of the chunks, all remaining matches are final then
+    for chunk in itertools.chain(chunks, [None]):
+        if chunk is not None:
+            buffer += chunk
+        pos = 0
+        for match in pattern.finditer(buffer):
+            if chunk is not None and match.end() > len(buffer) - SEPARATOR_MARGIN:
+                break
+            # re.split doesn't split twice at the same position
+            if skip_empty_start and match.start() == match.end() == 0:
+                continue
+            yield buffer[pos:match.start()]
+            yield from match.groups()
+            pos = match.end()
+            skip_empty_start = match.start() == match.end()
+        buffer = buffer[pos:]
+    yield buffer
+
+
+_sentence_tokenizers = {}
+_sentence_tokenizers_lock = threading.Lock()
+
+
+def load_sentence_tokenizer(lang):
+    if hasattr(tokenize, 'PunktTokenizer'):
+        # Newer nltk versions load the punkt_tab models instead of pickles
+        return tokenize.PunktTokenizer(lang)
+    return nltk.data.load(f'tokenizers/punkt/{lang}.pickle', cache=False)
+
+
+def get_sentence_tokenizer(lang='english'):
+    """
+    Returns the punkt sentence tokenizer of the language, its model is loaded only once per process.
+    Raises LookupError if there is no model for the language.
+    """
+    lang = lang.lower()
+    with _sentence_tokenizers_lock:
+        if lang not in _sentence_tokenizers:
+            _sentence_tokenizers[lang] = load_sentence_tokenizer(lang)
+        return _sentence_tokenizers[lang]
+
+
+def preload_sentence_tokenizers(languages=None):
+    """
+    Loads the tokenizers of the given languages, of all Languages by default. Returns the loaded languages.
+    """
+    if languages is None:
+        Language = apps.get_model('usermgmt', 'Language')
+        try:
+            languages = list(Language.objects.values_list('english_name', flat=True))
+        except db.DatabaseError:
+            # e.g. the tables don't exist before the first migration
+            return []
+    loaded = []
+    for lang in languages:
+        try:
+            get_sentence_tokenizer(lang)
+        except LookupError:
+            # nltk only has models for some languages
+            continue
+        loaded.append(lang.lower())
+    return loaded
+
+
+def tokenize_stream(chunks, lang='english'):
+    """
+    Yields the sentences of the text in chunks. The text is tokenized in blocks of about PARSE_CHUNK_SIZE characters,
+    the last sentence of a block could be incomplete and is tokenized again together with the next block.
+    Before the remaining text is tokenized again it has to grow by at least its own length, so text without
+    sentence boundaries is tokenized a logarithmic number of times instead of once per chunk.
+    """
+    tokenizer = get_sentence_tokenizer(lang)
+    buffer = ''
+    next_size = PARSE_CHUNK_SIZE
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) < next_size:
+            continue
+        sentences = tokenizer.tokenize(buffer)
+        last_start = buffer.rfind(sentences[-1]) if sentences else -1
+        if len(sentences) > 1 and last_start >= 0:
+            yield from sentences[:-1]
+            buffer = buffer[last_start:]
+        next_size = len(buffer) + max(PARSE_CHUNK_SIZE, len(buffer))
+    if buffer:
+        yield from tokenizer.tokenize(buffer)
+
+
+def parse_file(textfile, separator='\n\n', tknz=False, lang='english'):
+    """
+    Returns an iterator over the paragraphs (or sentences, if tknz is set) of the uploaded file.
+    Plain text files are read and split in chunks, so the whole content is never held in memory at once.
+    """
     textfile.seek(0)
     filepath = pathlib.PurePath(textfile.name)
     # Check suffix to identify filetype, unknown/no suffix is assumed plain text
@@ -107,23 +347,16 @@ def parse_file(textfile, separator='\n\n', tknz=False, lang='english'):
         doc = docx.Document(textfile)
         content = map(lambda par: par.text, doc.paragraphs)
         if tknz:
-            content_str = '\n'.join(content)
+            # Same as tokenizing '\n'.join(content)
+            content = tokenize_stream((('\n' if i > 0 else '') + par for i, par in enumerate(content)), lang.lower())
     #elif filepath.suffix in [<filetype>]:
     #   handle file type
     else:
-        content_bytes: bytes = textfile.read()
-        enc = chardet.detect(content_bytes)['encoding']
-        content_str = content_bytes.decode(enc)
-
-        content_str = content_str.replace('\r\n', '\n')
-        # Normalize newline characters
-        content_str = content_str.replace('\r', '\n')
-
-        if not tknz:
-            content = re.split(separator, content_str)
-
-    if tknz:
-        content = tokenize.sent_tokenize(content_str, language=lang.lower())
+        chunks = read_text_chunks(textfile)
+        if tknz:
+            content = tokenize_stream(chunks, lang.lower())
+        else:
+            content = split_stream(chunks, separator)
 
     # If there is any [\n]+ remaining (which would get in the way later),
     # replace it by a single \n (to not get in the way later).
@@ -132,13 +365,20 @@ def parse_file(textfile, separator='\n\n', tknz=False, lang='english'):
     return content
 
 
-def split_lines(lines, max_lines=None, max_chars=250):
-
-    # Run char split before line split
+def split_chars(lines, max_chars=250):
+    """
+    Returns the lines split into parts of at most max_chars characters, lines can be an iterator, e.g. from parse_file
+    """
     split_content = []
-    for line in list(lines):
+    for line in lines:
         split_content += split_str(line, max_chars)
+    return split_content
+
 
+def group_lines(split_content, max_lines=None):
+    """
+    Splits the list of lines into texts of about the same number of lines, at most max_lines each
+    """
     if max_lines is None:
         return [split_content]
 
@@ -153,7 +393,169 @@ def split_lines(lines, max_lines=None, max_chars=250):
     return text_split
 
 
+def split_lines(lines, max_lines=None, max_chars=250):
+
+    # Run char split before line split
+    return group_lines(split_chars(lines, max_chars), max_lines)
+
+
+def parse_upload(name, source, separator='\n\n', tknz=False, lang='english', max_chars=250):
+    """
+    Returns the lines of an uploaded file like split_chars(parse_file(...)). source is the path of the file
+    or its content, so that it can be passed to a worker process.
+    """
+    if isinstance(source, bytes):
+        return split_chars(parse_file(uploadedfile.SimpleUploadedFile(name, source), separator, tknz, lang), max_chars)
+    with open(source, 'rb') as f:
+        return split_chars(parse_file(uploadedfile.UploadedFile(f, name), separator, tknz, lang), max_chars)
+
+
+_upload_executor = None
+_upload_executor_lock = threading.Lock()
+
+
+def get_upload_executor():
+    global _upload_executor
+    with _upload_executor_lock:
+        if _upload_executor is None:
+            _upload_executor = futures.ProcessPoolExecutor(max_workers=settings.TEXT_UPLOAD_WORKERS)
+        return _upload_executor
+
+
+def parse_uploads(textfiles, separator='\n\n', tknz=False, lang='english', max_chars=250):
+    """
+    Returns the lines of every uploaded file, see parse_upload.
+    Multiple files are parsed in a process pool if settings.TEXT_UPLOAD_WORKERS is greater than 1.
+    """
+    if settings.TEXT_UPLOAD_WORKERS <= 1 or len(textfiles) <= 1:
+        return [split_chars(parse_file(f, separator, tknz, lang), max_chars) for f in textfiles]
+
+    sources = []
+    for textfile in textfiles:
+        # Large uploads are stored in temporary files, the workers can read them directly
+        if hasattr(textfile, 'temporary_file_path'):
+            sources.append(textfile.temporary_file_path())
+        else:
+            textfile.seek(0)
+            sources.append(textfile.read())
+    n = len(textfiles)
+    return list(get_upload_executor().map(parse_upload, [f.name for f in textfiles], sources,
+                                          [separator] * n, [tknz] * n, [lang] * n, [max_chars] * n))
+
+
+def group_sentences(lines):
+    """
+    Joins consecutive non-empty lines to sentences, empty lines separate the sentences.
+    This is how the content of a textfile is split into sentences.
+    """
+    sentence = ""
+    for l in lines:
+        line = l.strip()
+        if line == "":
+            if sentence != "":
+                yield sentence
+                sentence = ""
+        else:
+            if sentence != "":
+                sentence += ' '
+            sentence += line
+    if sentence != "":
+        yield sentence
+
+
+def make_sentences(content: 'list[str]'):
+    """
+    Returns the sentences of the file which make_file creates for content, without reading the file again
+    """
+    return list(group_sentences('\n\n'.join(content).split('\n')))
+
+
 def make_file(content: str, filename: str):
     return uploadedfile.SimpleUploadedFile(
         f'{filename}.txt', '\n\n'.join(content).encode('utf-8-sig')
     )
+
+
+
+class StreamBuffer:
+    """
+    Write-only file object which collects written data until it is popped.
+    zipfile detects that it is not seekable and writes data descriptors instead of seeking back.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def write_zip(file, members):
+    """
+    Writes a zip archive of the stored files `members`, given as (arcname, storage name), to `file`.
+    Instead of a storage name, members can give a function which returns the chunks of a generated file.
+    The files are copied chunk by chunk, wav files are not compressed.
+    This is a generator which yields after every chunk.
+    """
+    with zipfile.ZipFile(file, 'w') as zf:
+        for arcname, name in members:
+            zinfo = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+            if pathlib.PurePath(arcname).suffix == '.wav':
+                zinfo.compress_type = zipfile.ZIP_STORED
+            else:
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+            if callable(name):
+                with zf.open(zinfo, 'w') as dst:
+                    for chunk in name():
+                        dst.write(chunk)
+                        yield
+                continue
+            # Knowing the size in advance lets zipfile decide whether zip64 extensions are needed
+            zinfo.file_size = default_storage.size(name)
+            with default_storage.open(name, 'rb') as src, zf.open(zinfo, 'w') as dst:
+                for chunk in src.chunks():
+                    dst.write(chunk)
+                    yield
+
+
+def stream_zip(members):
+    """
+    Generates a zip archive of the stored files `members`, given as (arcname, storage name) like for write_zip, on the fly.
+    Memory usage only depends on the chunk size, not on the size of the files.
+    """
+    buffer = StreamBuffer()
+    for _ in write_zip(buffer, members):
+        data = buffer.pop()
+        if data:
+            yield data
+    # Remaining data and the central directory
+    yield buffer.pop()
+
+
+def move_file(src, dst):
+    """
+    Moves the stored file src to dst, replacing dst.
+    Storages with local paths rename the file atomically, other storages copy it.
+    """
+    try:
+        src_path, dst_path = default_storage.path(src), default_storage.path(dst)
+    except NotImplementedError:
+        default_storage.delete(dst)
+        with default_storage.open(src, 'rb') as f:
+            name = default_storage.save(dst, f)
+        # Another process stored dst in the meantime
+        if name != dst:
+            default_storage.delete(name)
+        default_storage.delete(src)
+    else:
+        os.replace(src_path, dst_path)
+
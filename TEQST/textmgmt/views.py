@@ -1,12 +1,15 @@
 from rest_framework import generics, response, status, views, exceptions, decorators, permissions as rf_permissions, \
     serializers as rf_serializers
 from django import http
+from django.conf import settings
 from django.core.files import base as base_files, uploadedfile
-from django.db.models import Q
+from django.db.models import Q, OuterRef, Prefetch, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.core.files.storage import default_storage
 from . import models, folderstats, serializers, stats, utils, permissions as text_permissions
 from usermgmt import models as user_models, permissions, serializers as user_serializers
-import calendar, datetime, codecs, pathlib
+from recordingmgmt import models as rec_models
+import calendar, datetime, codecs, itertools, pathlib
 
 
 @decorators.api_view(['POST'])
@@ -34,10 +37,11 @@ class PubFolderListView(generics.ListCreateAPIView):
     """
     queryset = models.Folder.objects.all()
     serializer_class = serializers.FolderFullSerializer
-    permission_classes = [rf_permissions.IsAuthenticated, permissions.IsPublisher]
+    permission_classes = [rf_permissions.IsAuthenticated, permissions.IsPublisher, permissions.IsOwner]
+    # Only lists the folders of the publisher
+    filter_backends = [permissions.PermissionFilter]
 
     def get_queryset(self):
-        user = self.request.user
         #the use of the parent param is deprecated. you should get this info with folderDetailView
         if 'parent' in self.request.query_params:
             if not models.Folder.objects.filter(pk=self.request.query_params['parent']).exists():
@@ -45,9 +49,9 @@ class PubFolderListView(generics.ListCreateAPIView):
             if models.Folder.objects.get(pk=self.request.query_params['parent']).is_shared_folder():
                 raise exceptions.NotFound("parent not found")
             #if parent is a sharedfolder: error message
-            return models.Folder.objects.filter(parent=self.request.query_params['parent'], owner=user.pk)
+            return models.Folder.objects.filter(parent=self.request.query_params['parent'])
 
-        return models.Folder.objects.filter(parent=None, owner=user.pk)  # parent=None means the folder is in the topmost layer
+        return models.Folder.objects.filter(parent=None)  # parent=None means the folder is in the topmost layer
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -119,6 +123,21 @@ class SpkTextListView(generics.RetrieveAPIView):
     serializer_class = serializers.SpkSharedFolderTextSerializer
     permission_classes = [rf_permissions.IsAuthenticated, permissions.IsSpeaker | text_permissions.BelowRoot | text_permissions.IsRoot]
 
+    def get_queryset(self):
+        """
+        The texts are prefetched with the word counts of the serializer, so they need one query for all texts
+        """
+        def word_count(**filters):
+            sentences = models.Sentence.objects.filter(text=OuterRef('pk'), **filters).order_by()
+            return Coalesce(Subquery(sentences.values('text').annotate(total=Sum('word_count')).values('total')), 0)
+
+        finished = rec_models.TextRecording.objects.filter(text=OuterRef('pk'), speaker=self.request.user).values('srec_count')
+        texts = models.Text.objects.annotate(sentences_finished=Coalesce(Subquery(finished), 0)).annotate(
+            words_total=word_count(),
+            words_finished=word_count(index__lte=OuterRef('sentences_finished')),
+        )
+        return super().get_queryset().prefetch_related(Prefetch('text', queryset=texts))
+
 
 class PubTextDetailedView(generics.RetrieveDestroyAPIView):
     """
@@ -197,7 +216,15 @@ class SpeechDataDownloadView(generics.RetrieveAPIView):
         instance = self.get_object()
         if not instance.has_any_recordings():
             raise exceptions.ParseError("Nothing to download yet.")
-        zip_path = instance.create_zip_for_download()
+
+        # The fingerprint is computed once per download, it reads all recordings of the folder
+        fingerprint = instance.get_download_fingerprint()
+        if settings.STREAM_DOWNLOADS and instance.get_cached_zip(fingerprint) is None:
+            resp = http.StreamingHttpResponse(instance.stream_zip_for_download(fingerprint), content_type='application/zip')
+            resp['Content-Disposition'] = 'attachment; filename="download.zip"'
+            return resp
+
+        zip_path = instance.create_zip_for_download(fingerprint)
         
         # zipfile = default_storage.open(zip_path, 'rb')
         # resp = http.HttpResponse()
@@ -487,9 +514,8 @@ class LstnSharedFolderStatsView(generics.RetrieveAPIView):
         
         def get_speaker_stats(self, obj):
             user = self.context['request'].user
-            perm_qs = text_permissions.get_listener_permissions(obj, user)
-            user_list = text_permissions.get_combined_speakers(perm_qs)
-            return stats.sharedfolder_stats(obj, user_filter=user_list)
+            speakers = text_permissions.get_visible_speakers(obj, user)
+            return stats.cached_sharedfolder_stats(obj, user_filter=speakers)
 
     queryset = models.SharedFolder.objects.all()
     serializer_class = OutputSerializer
@@ -513,9 +539,8 @@ class LstnTextStatsView(generics.RetrieveAPIView):
         
         def get_speaker_stats(self, obj):
             user = self.context['request'].user
-            perm_qs = text_permissions.get_listener_permissions(obj.shared_folder, user)
-            user_list = text_permissions.get_combined_speakers(perm_qs)
-            return stats.text_stats(obj, user_filter=user_list)
+            speakers = text_permissions.get_visible_speakers(obj.shared_folder, user)
+            return stats.cached_text_stats(obj, user_filter=speakers)
 
     queryset = models.Text.objects.all()
     serializer_class = OutputSerializer
@@ -642,21 +667,19 @@ class PubTextUploadView(generics.CreateAPIView):
 
         content: 'list[tuple[str, str]]'
         content = []        
+        # Parsing and splitting the files is the expensive part, it can run in a process pool
+        file_lines = utils.parse_uploads(textfile, separator, tokenize, language.english_name, max_chars)
 
         if naming == CONCAT:
-            pre_split = []
-            for file in textfile:
-                pre_split += utils.parse_file(file, separator, tokenize, language.english_name)
-            loc_content = utils.split_lines(pre_split, max_lines, max_chars)
+            loc_content = utils.group_lines(list(itertools.chain.from_iterable(file_lines)), max_lines)
             for i, text in enumerate(loc_content):
                 name = title
                 if len(loc_content) > 1:
                     name = f'{name}_{i+1:03d}'
                 content.append( (name, text) )
         else:
-            for fc, file in enumerate(textfile):
-                pre_split = utils.parse_file(file, separator, tokenize, language.english_name)
-                loc_content = utils.split_lines(pre_split, max_lines, max_chars)
+            for fc, (file, lines) in enumerate(zip(textfile, file_lines)):
+                loc_content = utils.group_lines(lines, max_lines)
                 for i, text in enumerate(loc_content):
                     if naming == FILENAMES:
                         name = pathlib.PurePath(file.name).stem.replace('__', '_')
@@ -668,16 +691,16 @@ class PubTextUploadView(generics.CreateAPIView):
         
         sf: models.SharedFolder = parent.make_shared_folder()
         # Create multiple texts if necessary
-        for name, section in content:
-            new_name = name
-            count = 2
-            while models.Text.objects.filter(shared_folder=sf, title=new_name).exists():
-                new_name = f'{name}_{count:02d}'
-                count += 1
-            models.Text.objects.create(
+        titles = sf.unique_text_titles([name for name, _ in content])
+        texts = []
+        for (name, section), new_name in zip(content, titles):
+            text = models.Text(
                 shared_folder = sf,
                 #textfile = base_files.ContentFile('\n\n'.join(section)),
                 textfile = utils.make_file(section, name),
                 title = new_name,
                 language = language,
             )
+            # The sentences are already known, so the stored files don't have to be read and decoded again
+            texts.append( (text, utils.make_sentences(section)) )
+        models.Text.bulk_create_with_sentences(texts)
@@ -0,0 +1,8 @@
+from django.db import migrations
+
+def add_en(apps, schema_editor):
+    apps.get_model('usermgmt', 'Language').objects.get_or_create(short='en', defaults={'native_name': 'english', 'english_name': 'english'})
+
+class Migration(migrations.Migration):
+    dependencies = [('usermgmt', '0001_initial')]
+    operations = [migrations.RunPython(add_en)]
@@ -1,5 +1,11 @@
 from django.core.checks import messages
-from rest_framework import permissions
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+from rest_framework import filters, permissions
+
+
+# Matches no objects
+NOTHING = Q(pk__in=[])
 
 
 class IsPublisher(permissions.BasePermission):
@@ -18,6 +24,9 @@ class IsOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return obj.is_owner(request.user)
 
+    def get_object_filter(self, request, view, model):
+        return model.owner_filter(request.user)
+
 
 class IsSpeaker(permissions.BasePermission):
 
@@ -26,6 +35,9 @@ class IsSpeaker(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return obj.is_speaker(request.user)
 
+    def get_object_filter(self, request, view, model):
+        return model.speaker_filter(request.user)
+
 
 class IsListener(permissions.BasePermission):
 
@@ -34,6 +46,9 @@ class IsListener(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return obj.is_listener(request.user)
 
+    def get_object_filter(self, request, view, model):
+        return model.listener_filter(request.user)
+
 
 class ReadOnly(permissions.BasePermission):
 
@@ -44,4 +59,54 @@ class ReadOnly(permissions.BasePermission):
 
 
     def has_object_permission(self, request, view, obj):
-        return request.method in permissions.SAFE_METHODS
\ No newline at end of file
+        return request.method in permissions.SAFE_METHODS
+
+    def get_object_filter(self, request, view, model):
+        return Q() if request.method in permissions.SAFE_METHODS else NOTHING
+
+
+def get_object_filter(permission, request, view, model):
+    """
+    Returns a Q object for the objects of the model for which permission.has_object_permission is True.
+    Permissions provide this with a get_object_filter method, permissions combined with &, | and ~ are supported.
+    """
+    if hasattr(permission, 'get_object_filter'):
+        return permission.get_object_filter(request, view, model)
+    if isinstance(permission, permissions.AND):
+        return get_object_filter(permission.op1, request, view, model) & get_object_filter(permission.op2, request, view, model)
+    if isinstance(permission, permissions.OR):
+        q1 = get_object_filter(permission.op1, request, view, model)
+        q2 = get_object_filter(permission.op2, request, view, model)
+        # An empty Q allows every object, but Q() | q would only allow the objects of q
+        return q1 | q2 if q1 and q2 else Q()
+    if isinstance(permission, permissions.NOT):
+        q = get_object_filter(permission.op1, request, view, model)
+        return ~q if q else NOTHING
+    if type(permission).has_object_permission is permissions.BasePermission.has_object_permission:
+        # Permissions which only implement has_permission allow every object
+        return Q()
+    raise ImproperlyConfigured(f'{type(permission).__name__} does not support batch permission checks')
+
+
+def filter_permitted(request, view, queryset, permission_classes=None):
+    """
+    Filters the queryset to the objects which pass the object permissions of the view, or of the given
+    permission classes, with the filters of the models instead of one check per object
+    """
+    if permission_classes is None:
+        perms = view.get_permissions()
+    else:
+        perms = [permission() for permission in permission_classes]
+    q = Q()
+    for permission in perms:
+        q &= get_object_filter(permission, request, view, queryset.model)
+    return queryset.filter(q)
+
+
+class PermissionFilter(filters.BaseFilterBackend):
+    """
+    Filter backend for list views, which only lists the objects the user has object permissions for
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        return filter_permitted(request, view, queryset)